@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+"""batch.py: Solve a manifest of TTSA jobs on a warm process pool, streaming one JSON line per job"""
+
+__author__ = "Colin Burgin"
+__copyright__ = "Copyright 2017, Virginia Tech"
+__credits__ = [""]
+__license__ = "MIT"
+__version__ = "1.0"
+__maintainer__ = "Colin Burgin"
+__email__ = "cburgin@vt.edu"
+__status__ = "in progress"
+
+# Standard Python Libraries
+import csv
+import json
+import multiprocessing
+import sys
+import time
+
+# TTSA Includes
+from bounds import cached_lower_bound
+from instances import load_cost_matrix
+from ttsa import DEFAULT_PARAMS, make_solver
+
+# Types of the SA parameters, CSV cells are converted with them
+PARAM_TYPES = {"tau": float, "beta": float, "omega": float, "delta": float, "theta": float,
+               "maxc": int, "maxp": int, "maxr": int, "gamma": float}
+
+# Types of the other job fields
+JOB_TYPES = {"id": str, "instance": str, "number_teams": int, "seed": int, "seconds": float, "iterations": int,
+             "target_cost": int, "target_gap": float, "engine": str, "builder": str, "selection": str}
+
+# Every worker process keeps the matrices and lower bounds it loaded for the jobs that follow
+_matrices = {}
+
+
+# Read a manifest of jobs. A JSON manifest is a list of jobs, or an object with the "jobs" list and
+#   "defaults" every job starts from. A job has an instance path and optionally number_teams, seed,
+#   params (a dict of SA parameters), seconds, iterations, target_cost, target_gap, engine, builder,
+#   selection and id. A CSV manifest has a header row naming these fields, with the SA parameters as columns of
+#   their own, and one job per row. Empty cells are left out.
+def read_manifest(file_name):
+    with open(file_name, 'r', newline='') as f:
+        if file_name.lower().endswith(".csv"):
+            defaults = {}
+            jobs = [parse_row(row, file_name) for row in csv.DictReader(f)]
+        else:
+            manifest = json.load(f)
+            if isinstance(manifest, dict):
+                defaults = manifest.get("defaults", {})
+                jobs = manifest.get("jobs", [])
+            else:
+                defaults = {}
+                jobs = manifest
+
+    full_jobs = []
+    for k, job in enumerate(jobs):
+        full = dict(defaults)
+        full.update(job)
+        full["params"] = dict(defaults.get("params", {}), **job.get("params", {}))
+        full.setdefault("id", str(k))
+        if "instance" not in full:
+            raise ValueError("Job %s of the manifest %s has no instance" % (full["id"], file_name))
+        unknown = set(full["params"]) - set(PARAM_TYPES)
+        if unknown:
+            raise ValueError("Job %s of the manifest %s has unknown parameters %s" % (full["id"], file_name, ", ".join(sorted(unknown))))
+        full_jobs.append(convert_job(full, file_name))
+    return full_jobs
+
+# Convert one CSV row into a job, its cells are converted with the JSON jobs
+def parse_row(row, file_name):
+    job = {"params": {}}
+    for name, value in row.items():
+        if value is None or value.strip() == "":
+            continue
+        value = value.strip()
+        if name in PARAM_TYPES:
+            job["params"][name] = value
+        elif name in JOB_TYPES:
+            job[name] = value
+        else:
+            raise ValueError("Unknown column %s in the manifest %s" % (name, file_name))
+    return job
+
+# Convert the fields and SA parameters of a job to their types, so that e.g. a seed of "3" runs as 3
+def convert_job(job, file_name):
+    fields = [(job, name, JOB_TYPES[name]) for name in JOB_TYPES if job.get(name) is not None]
+    fields += [(job["params"], name, PARAM_TYPES[name]) for name in PARAM_TYPES if job["params"].get(name) is not None]
+    for values, name, kind in fields:
+        try:
+            values[name] = kind(values[name])
+        except (TypeError, ValueError):
+            raise ValueError("Job %s of the manifest %s has an invalid %s: %r" % (job["id"], file_name, name, values[name]))
+    return job
+
+# The cost matrix and lower bound of an instance, loaded once per worker process
+def cached_matrix(instance, number_teams):
+    key = (instance, number_teams)
+    if key not in _matrices:
+        cost_matrix = load_cost_matrix(instance, number_teams)
+        _matrices[key] = (cost_matrix, cached_lower_bound(cost_matrix))
+    return _matrices[key]
+
+# Solve one job and return its result record. A job that fails, e.g. on a missing instance file or
+#   an unknown engine, gives a record with the error instead of stopping the batch.
+def run_job(job):
+    record = {"id": job["id"], "instance": job["instance"], "seed": job.get("seed", 1)}
+    start_time = time.time()
+    try:
+        cost_matrix, lower_bound = cached_matrix(job["instance"], job.get("number_teams"))
+        load_seconds = time.time() - start_time
+
+        params = dict(DEFAULT_PARAMS)
+        params.update(job["params"])
+        ttsa = make_solver(params, job.get("engine", "list"), seed=record["seed"],
+                           builder=job.get("builder", "circle"), cost_matrix=cost_matrix, lower_bound=lower_bound,
+                           selection=job.get("selection", "uniform"), verbose=False)
+        result = ttsa.solve(job.get("seconds"), job.get("iterations"), job.get("target_cost"),
+                            target_gap=job.get("target_gap"))
+    except Exception as e:
+        record["error"] = "%s: %s" % (type(e).__name__, e)
+        record["total_seconds"] = time.time() - start_time
+        return record
+
+    # Report the best feasible schedule, or the best infeasible one when none was found
+    feasible = result.best_feasible_cost is not None
+    S = result.best_feasible_S if feasible else result.best_infeasible_S
+    best_S = ttsa.best_feasible_S if feasible else ttsa.best_infeasible_S
+    record.update({"number_teams": len(cost_matrix), "params": params, "feasible": feasible,
+                   "cost": ttsa.cost(best_S) if S else None, "violations": ttsa.nbv(best_S) if S else None,
+                   "lower_bound": lower_bound, "gap": result.gap, "iterations": result.iterations,
+                   "finished": result.finished, "move_weights": result.move_weights, "load_seconds": load_seconds, "solve_seconds": result.seconds,
+                   "total_seconds": time.time() - start_time,
+                   "schedule": [[g[0] if g[1] == "home" else -g[0] for g in row] for row in S]})
+    return record
+
+# Solve every job of a manifest on a pool of worker processes that stays up for the whole batch, and
+#   write one JSON line per job to out as soon as it finishes, in the order they finish. The schedule
+#   of a record has a row per team of signed opponents, + at home and - away. Returns the records.
+def solve_batch(jobs, workers=None, out=sys.stdout):
+    records = []
+    with multiprocessing.Pool(workers) as pool:
+        for record in pool.imap_unordered(run_job, jobs):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            records.append(record)
+    return records
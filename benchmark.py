@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+"""benchmark.py: Move throughput and time-to-quality benchmarks for TTSA"""
+
+__author__ = "Colin Burgin"
+__copyright__ = "Copyright 2017, Virginia Tech"
+__credits__ = [""]
+__license__ = "MIT"
+__version__ = "1.0"
+__maintainer__ = "Colin Burgin"
+__email__ = "cburgin@vt.edu"
+__status__ = "in progress"
+
+# Standard Python Libraries
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+# TTSA Includes
+from generate import KINDS, generate_matrix
+from streams import RandomStream
+from ttsa import MOVE_NAMES, make_solver
+
+# The shipped NL instances
+INSTANCES = [4, 6, 8, 10, 12, 14, 16]
+
+
+# Time a function, best of repeat runs of an automatically chosen number of calls
+def time_call(func, repeat):
+    timer = timeit.Timer(func)
+    number, total = timer.autorange()
+    best = min([total] + timer.repeat(repeat - 1, number)) if repeat > 1 else total
+    return {"calls": number, "seconds_per_call": best / number, "calls_per_second": number / best}
+
+# Microbenchmarks of the evaluation functions, the builders and every move on one instance
+#   The backtracking builder is only timed up to backtrack_max teams, beyond that it can take minutes.
+def micro_benchmark(number_teams, engine, repeat, instance=None, seed=1, backtrack_max=12):
+    ttsa = make_solver(None, engine, number_teams, seed, instance=instance)
+    ttsa.set_schedule(ttsa.S)
+    results = []
+
+    def add(name, func):
+        entry = {"instance": number_teams, "engine": engine, "name": name}
+        entry.update(time_call(func, repeat))
+        results.append(entry)
+
+    S = ttsa.S
+    add("cost", lambda: ttsa.cost(S))
+    add("nbv", lambda: ttsa.nbv(S))
+    add("cost_ttsa", lambda: ttsa.cost_ttsa(S))
+    for builder in ("circle", "backtrack"):
+        if builder == "backtrack" and number_teams > backtrack_max:
+            continue
+        def build(builder=builder):
+            ttsa.builder = builder
+            ttsa.build_schedule(number_teams)
+        add("build_schedule[%s]" % builder, build)
+    ttsa.builder = "circle"
+
+    # The moves keep walking the same schedule, so every call sees a valid schedule
+    ttsa.rng = RandomStream(seed)
+    for move in MOVE_NAMES:
+        add(move, lambda move=getattr(ttsa, move): move(S))
+    add("random_move+delta_eval", lambda: ttsa.delta_eval(S, ttsa.random_move(S)))
+
+    # Every move evaluated incrementally against evaluating the whole schedule, both rolled back after
+    def evaluated(move, evaluate):
+        undo = move(S)
+        evaluate(undo)
+        ttsa.undo_move(S, undo)
+    for name in MOVE_NAMES:
+        move = getattr(ttsa, name)
+        add(name + "+delta_eval", lambda move=move: evaluated(move, lambda undo: ttsa.delta_eval(S, undo)))
+        add(name + "+full_eval", lambda move=move: evaluated(move, lambda undo: (ttsa.cost(S), ttsa.nbv(S))))
+    return results
+
+# Run a fixed seed for a time budget and record the best feasible cost over wall time
+def end_to_end(number_teams, engine, seed, seconds, instance=None, every=1000):
+    ttsa = make_solver(None, engine, number_teams, seed, instance=instance)
+    # The bound is computed before the clock starts, so it is not in the trace nor the budget
+    lower_bound = ttsa.bound()
+    trace = []
+    start_time = time.time()
+
+    def progress(result):
+        trace.append({"seconds": time.time() - start_time, "iterations": result.iterations,
+                      "best_feasible_cost": result.best_feasible_cost})
+
+    result = ttsa.solve(seconds=seconds, callback=progress, callback_every=every)
+    return {"instance": number_teams, "engine": engine, "seed": seed, "seconds": result.seconds,
+            "iterations": result.iterations, "iterations_per_second": result.iterations / result.seconds,
+            "best_feasible_cost": result.best_feasible_cost, "best_infeasible_cost": result.best_infeasible_cost,
+            "lower_bound": lower_bound, "finished": result.finished, "trace": trace}
+
+# How construction time, memory and iteration speed grow with the number of teams, on a generated
+#   instance of the given kind. The memory is the peak traced while setting up the solver and its
+#   starting schedule, measured in a separate pass so tracing does not slow down the timings.
+def scaling(number_teams, engine, kind, seconds, repeat, seed=1, backtrack_max=12):
+    matrix = generate_matrix(kind, number_teams, seed)
+    entry = {"instance": "%s%d" % (kind, number_teams), "number_teams": number_teams, "engine": engine, "seed": seed}
+
+    tracemalloc.start()
+    ttsa = make_solver(None, engine, number_teams, seed, cost_matrix=matrix)
+    ttsa.set_schedule(ttsa.S)
+    entry["setup_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    for builder in ("circle", "backtrack"):
+        if builder == "backtrack" and number_teams > backtrack_max:
+            continue
+        def build(builder=builder):
+            ttsa.builder = builder
+            ttsa.build_schedule(number_teams)
+        entry["build_schedule[%s]" % builder] = time_call(build, repeat)["seconds_per_call"]
+    ttsa.builder = "circle"
+
+    S = ttsa.S
+    entry["moves_per_second"] = time_call(lambda: ttsa.delta_eval(S, ttsa.random_move(S)), repeat)["calls_per_second"]
+    entry["full_cost_per_second"] = time_call(lambda: ttsa.cost_ttsa(S), repeat)["calls_per_second"]
+
+    # The annealing itself, on a fresh solver
+    ttsa = make_solver(None, engine, number_teams, seed, cost_matrix=matrix)
+    result = ttsa.solve(seconds=seconds)
+    entry.update({"seconds": result.seconds, "iterations": result.iterations,
+                  "iterations_per_second": result.iterations / result.seconds,
+                  "best_feasible_cost": result.best_feasible_cost, "lower_bound": ttsa.bound()})
+    return entry
+
+# Where and on what the benchmark ran, so results from different runs can be compared
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0],
+            "platform": platform.platform(), "numpy": numpy_version, "commit": commit}
+
+def main():
+    #Parse the command line arguments provided at run time.
+    parser = argparse.ArgumentParser(description='Benchmarks for the Traveling Tournament Problem using Simulated Annealing')
+    parser.add_argument('-n', '--number_teams', dest='instances', metavar='N', type=int, nargs='+', default=INSTANCES,
+                        help='Instances to benchmark, default: all of the shipped data4 to data16')
+    parser.add_argument('--engine', dest='engines', choices=['list', 'numpy'], nargs='+', default=['list'],
+                        help='Engines to benchmark, default: list')
+    parser.add_argument('--repeat', dest='repeat', metavar='R', type=int, default=3,
+                        help='Repeats of every microbenchmark, the best one is reported, default: 3')
+    parser.add_argument('--backtrack-max', dest='backtrack_max', metavar='N', type=int, default=12,
+                        help='Largest instance to time the backtracking builder on, default: 12')
+    parser.add_argument('--seeds', dest='seeds', metavar='S', type=int, nargs='+', default=[1],
+                        help='Seeds of the end-to-end runs, default: 1')
+    parser.add_argument('--seconds', dest='seconds', metavar='S', type=float, default=10,
+                        help='Wall time of every end-to-end run, default: 10')
+    parser.add_argument('--scaling', dest='scaling', metavar='N', type=int, nargs='+',
+                        help='Also measure the scaling on generated instances with these numbers of teams')
+    parser.add_argument('--kind', dest='kind', choices=KINDS, default='euclidean',
+                        help='Kind of the generated instances of --scaling, default: euclidean')
+    parser.add_argument('--skip-micro', dest='micro', action='store_false', help='Skip the microbenchmarks')
+    parser.add_argument('--skip-end-to-end', dest='end_to_end', action='store_false', help='Skip the end-to-end runs')
+    parser.add_argument('-o', '--output', dest='output', metavar='FILE', help='Write the JSON results to FILE instead of stdout')
+    args = parser.parse_args()
+
+    results = {"environment": environment(), "micro": [], "end_to_end": [], "scaling": []}
+    for engine in args.engines:
+        for number_teams in args.scaling or []:
+            results["scaling"].append(scaling(number_teams, engine, args.kind, args.seconds, args.repeat,
+                                              backtrack_max=args.backtrack_max))
+        for number_teams in args.instances:
+            if args.micro:
+                results["micro"] += micro_benchmark(number_teams, engine, args.repeat, backtrack_max=args.backtrack_max)
+            if args.end_to_end:
+                for seed in args.seeds:
+                    results["end_to_end"].append(end_to_end(number_teams, engine, seed, args.seconds))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+    else:
+        json.dump(results, sys.stdout, indent=1)
+        print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""bounds.py: Lower bounds on the travel cost of Traveling Tournament Problem instances"""
+
+__author__ = "Colin Burgin"
+__copyright__ = "Copyright 2017, Virginia Tech"
+__credits__ = [""]
+__license__ = "MIT"
+__version__ = "1.0"
+__maintainer__ = "Colin Burgin"
+__email__ = "cburgin@vt.edu"
+__status__ = "in progress"
+
+# Standard Python Libraries
+import itertools
+import time
+
+# Largest instance the exact bound of every team is computed for, it takes seconds at 16 teams
+#   and grows by about 4x for every two more
+EXACT_MAX = 16
+
+# Exact bounds of the teams already computed in this process, keyed by the cost matrix
+_team_bounds = {}
+
+
+# Cost of the cheapest trip from home through every opponent in a set and back, for every set of
+#   at most max_trip opponents, keyed by the bitmask of the set over the positions in others
+def trip_costs(d, team, others, max_trip):
+    trips = {}
+    for size in range(1, max_trip + 1):
+        for combo in itertools.combinations(range(len(others)), size):
+            mask = 0
+            for c in combo:
+                mask |= 1 << c
+            best = None
+            for order in itertools.permutations([others[c] for c in combo]):
+                cost = d[team][order[0]] + d[order[-1]][team]
+                for a, b in zip(order, order[1:]):
+                    cost += d[a][b]
+                if best is None or cost < best:
+                    best = cost
+            trips[mask] = best
+    return trips
+
+# Cheapest way for one team to visit every opponent once in trips of at most 3 away games, by
+#   dynamic programming over the sets of opponents. The trip serving the lowest opponent of a set
+#   is tried with every one or two other opponents of the set.
+def team_lower_bound(d, team):
+    others = [j for j in range(len(d)) if j != team]
+    trips = trip_costs(d, team, others, 3)
+    f = [0] * (1 << len(others))
+    for mask in range(1, len(f)):
+        low = mask & -mask
+        rest = mask ^ low
+        best = trips[low] + f[rest]
+        r1 = rest
+        while r1:
+            b = r1 & -r1
+            r1 ^= b
+            cost = trips[low | b] + f[rest ^ b]
+            if cost < best:
+                best = cost
+            r2 = r1
+            while r2:
+                e = r2 & -r2
+                r2 ^= e
+                cost = trips[low | b | e] + f[rest ^ b ^ e]
+                if cost < best:
+                    best = cost
+        f[mask] = best
+    return f[-1]
+
+# A weaker bound for large instances: a trip costs at least twice the distance to its farthest
+#   opponent, and that is cheapest with the opponents grouped by distance, farthest first
+def team_trip_bound(d, team):
+    far = sorted((d[team][j] for j in range(len(d)) if j != team), reverse=True)
+    return sum(2 * x for x in far[::3])
+
+# The independent lower bound: every team's cheapest travel on its own, ignoring the other teams,
+#   summed over the teams. Exact for every team up to exact_max teams, the weaker trip bound beyond.
+def independent_lower_bound(cost_matrix, exact_max=EXACT_MAX):
+    d = cost_matrix.tolist() if hasattr(cost_matrix, "tolist") else cost_matrix
+    team_bound = team_lower_bound if len(d) <= exact_max else team_trip_bound
+    return sum(team_bound(d, team) for team in range(len(d)))
+
+# The independent lower bound of a cost matrix, the exact bound of every team computed only once
+#   per process for every matrix. Past the deadline the teams still missing get the weaker trip bound,
+#   which gives a looser but valid bound, and a later call goes on with the exact bounds of the rest.
+def cached_lower_bound(cost_matrix, exact_max=EXACT_MAX, deadline=None):
+    d = cost_matrix.tolist() if hasattr(cost_matrix, "tolist") else cost_matrix
+    if len(d) > exact_max:
+        return independent_lower_bound(d, exact_max)
+    teams = _team_bounds.setdefault(tuple(tuple(row) for row in d), {})
+    bound = 0
+    for team in range(len(d)):
+        if team not in teams:
+            if deadline is not None and time.time() >= deadline:
+                bound += team_trip_bound(d, team)
+                continue
+            teams[team] = team_lower_bound(d, team)
+        bound += teams[team]
+    return bound
+
+# Relative gap of a cost above the lower bound, None without a cost
+def relative_gap(cost, lower_bound):
+    if cost is None:
+        return None
+    if lower_bound <= 0:
+        return 0.0 if cost <= 0 else float("inf")
+    return (cost - lower_bound) / lower_bound
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+"""generate.py: Synthetic Traveling Tournament Problem instances for any even number of teams"""
+
+__author__ = "Colin Burgin"
+__copyright__ = "Copyright 2017, Virginia Tech"
+__credits__ = [""]
+__license__ = "MIT"
+__version__ = "1.0"
+__maintainer__ = "Colin Burgin"
+__email__ = "cburgin@vt.edu"
+__status__ = "in progress"
+
+# Standard Python Libraries
+import argparse
+import math
+import random
+import sys
+
+# TTSA Includes
+from instances import validate_cost_matrix
+
+# The kinds of instances generate_matrix can make
+KINDS = ["circ", "euclidean", "clustered"]
+
+# Side of the square the Euclidean and clustered teams are placed in
+SIZE = 1000
+
+
+# The CIRC-n instance: the teams sit on a circle 1 apart, the distance is the shorter way around
+def circ_matrix(number_teams):
+    return [[min(abs(i - j), number_teams - abs(i - j)) for j in range(number_teams)] for i in range(number_teams)]
+
+# Rounded Euclidean distances between points
+def distance_matrix(points):
+    return [[int(round(math.hypot(xi - xj, yi - yj))) for (xj, yj) in points] for (xi, yi) in points]
+
+# Teams placed uniformly at random in the square
+def euclidean_matrix(number_teams, seed, size=SIZE):
+    prng = random.Random(seed)
+    return distance_matrix([(prng.uniform(0, size), prng.uniform(0, size)) for i in range(number_teams)])
+
+# Teams placed around a few random cluster centers, like leagues whose teams sit in a few regions
+def clustered_matrix(number_teams, seed, clusters=None, size=SIZE, spread=0.05):
+    prng = random.Random(seed)
+    if clusters is None:
+        clusters = max(2, int(round(math.sqrt(number_teams / 2))))
+    centers = [(prng.uniform(0, size), prng.uniform(0, size)) for i in range(clusters)]
+    points = []
+    for i in range(number_teams):
+        x, y = centers[i % clusters]
+        points.append((min(max(prng.gauss(x, spread * size), 0), size), min(max(prng.gauss(y, spread * size), 0), size)))
+    return distance_matrix(points)
+
+# A cost matrix of the given kind for an even number of teams, the same one for the same seed
+def generate_matrix(kind, number_teams, seed=1):
+    if number_teams < 2 or number_teams % 2 != 0:
+        raise ValueError("Instances need an even number of teams, not %d" % number_teams)
+    if kind == "circ":
+        return circ_matrix(number_teams)
+    if kind == "euclidean":
+        return euclidean_matrix(number_teams, seed)
+    if kind == "clustered":
+        return clustered_matrix(number_teams, seed)
+    raise ValueError("Unknown instance kind " + kind + ", expected one of " + ", ".join(KINDS))
+
+# The conventional file name of a generated instance
+def instance_name(kind, number_teams, seed=1):
+    if kind == "circ":
+        return "circ%d.txt" % number_teams
+    return "%s%d_%d.txt" % (kind, number_teams, seed)
+
+# Write a cost matrix in the whitespace separated text format load_cost_matrix reads
+def write_cost_matrix(matrix, f):
+    width = len(str(max(max(row) for row in matrix)))
+    for row in matrix:
+        f.write(" ".join(str(x).rjust(width) for x in row) + "\n")
+
+def main():
+    #Parse the command line arguments provided at run time.
+    parser = argparse.ArgumentParser(description='Generate synthetic Traveling Tournament Problem instances')
+    parser.add_argument('-n', '--number_teams', dest='number_teams', metavar='N', type=int, required=True,
+                        help='Number of teams (even)')
+    parser.add_argument('-k', '--kind', dest='kind', choices=KINDS, default='euclidean',
+                        help='Circular distances, uniform random points or clustered points, default: euclidean')
+    parser.add_argument('-s', '--seed', dest='seed', metavar='S', type=int, default=1,
+                        help='Seed of the random points, default: 1')
+    parser.add_argument('-o', '--output', dest='output', metavar='FILE',
+                        help='Write the instance to FILE instead of stdout')
+    args = parser.parse_args()
+
+    matrix = generate_matrix(args.kind, args.number_teams, args.seed)
+    validate_cost_matrix(matrix, args.number_teams, instance_name(args.kind, args.number_teams, args.seed))
+    if args.output:
+        with open(args.output, 'w') as f:
+            write_cost_matrix(matrix, f)
+    else:
+        write_cost_matrix(matrix, sys.stdout)
+
+if __name__ == '__main__':
+    main()
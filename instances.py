@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+"""instances.py: Loading Traveling Tournament Problem instances"""
+
+__author__ = "Colin Burgin"
+__copyright__ = "Copyright 2017, Virginia Tech"
+__credits__ = [""]
+__license__ = "MIT"
+__version__ = "1.0"
+__maintainer__ = "Colin Burgin"
+__email__ = "cburgin@vt.edu"
+__status__ = "in progress"
+
+# Standard Python Libraries
+import os
+
+# NumPy is optional, without it the matrix is parsed from the text on every load
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Where the shipped NL instances live
+DATA_DIR = "data"
+
+
+# Resolve an instance path, a directory is searched for the data{n}.txt file of the number of teams
+def instance_path(path, number_teams=None):
+    if path is None:
+        path = DATA_DIR
+    if os.path.isdir(path):
+        if number_teams is None:
+            raise ValueError("The number of teams is needed to find an instance in the directory " + path)
+        path = os.path.join(path, "data" + str(number_teams) + ".txt")
+    if not os.path.isfile(path):
+        raise ValueError("No instance file found at " + path)
+    return path
+
+# Parse the whitespace separated text cost matrix into rows of ints
+def parse_cost_matrix(file_name):
+    matrix = []
+    with open(file_name, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if len(line) > 0:
+                matrix.append([int(x) for x in line.split()])
+
+    return matrix
+
+# Make sure the matrix is a square, symmetric distance matrix for an even number of teams
+def validate_cost_matrix(matrix, number_teams=None, file_name=""):
+    size = len(matrix)
+    if size == 0 or size % 2 != 0:
+        raise ValueError("The cost matrix %s must have an even, non zero number of teams, found %d" % (file_name, size))
+    if number_teams is not None and size != number_teams:
+        raise ValueError("The cost matrix %s is for %d teams, expected %d" % (file_name, size, number_teams))
+    for i, row in enumerate(matrix):
+        if len(row) != size:
+            raise ValueError("Row %d of the cost matrix %s has %d entries, expected %d" % (i, file_name, len(row), size))
+        for j in range(i + 1):
+            if row[j] != matrix[j][i]:
+                raise ValueError("The cost matrix %s is not symmetric at (%d, %d)" % (file_name, i, j))
+            if i == j and row[j] != 0:
+                raise ValueError("The cost matrix %s has a non zero distance from team %d to itself" % (file_name, i))
+
+# Sidecar binary cache for an instance file
+def cache_path(file_name):
+    return file_name + ".npy"
+
+# Load the cost matrix of an instance from a file or a directory of data{n}.txt files.
+#   With NumPy the parsed matrix is written to a sidecar .npy cache once, and later loads
+#   memory-map that cache instead of parsing the text again. Returns an int array with
+#   NumPy and rows of ints without it.
+def load_cost_matrix(path=None, number_teams=None, cache=True):
+    file_name = instance_path(path, number_teams)
+
+    if np is None:
+        matrix = parse_cost_matrix(file_name)
+        validate_cost_matrix(matrix, number_teams, file_name)
+        return matrix
+
+    # Use the cache as long as it is newer than the text file
+    npy_name = cache_path(file_name)
+    if cache and os.path.isfile(npy_name) and os.path.getmtime(npy_name) >= os.path.getmtime(file_name):
+        matrix = np.load(npy_name, mmap_mode='r')
+        if number_teams is not None and len(matrix) != number_teams:
+            raise ValueError("The cost matrix %s is for %d teams, expected %d" % (file_name, len(matrix), number_teams))
+        return matrix
+
+    matrix = parse_cost_matrix(file_name)
+    validate_cost_matrix(matrix, number_teams, file_name)
+    matrix = np.array(matrix, dtype=np.int64)
+    if cache:
+        write_cache(npy_name, matrix)
+    return matrix
+
+# Write the cache atomically so concurrent runs never see a partial file
+def write_cache(npy_name, matrix):
+    tmp_name = "%s.%d.tmp" % (npy_name, os.getpid())
+    try:
+        with open(tmp_name, 'wb') as f:
+            np.save(f, matrix)
+        os.replace(tmp_name, npy_name)
+    except OSError:
+        # A read only data directory just means no cache
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
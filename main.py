@@ -13,10 +13,16 @@ __status__ = "in progress"
 
 # Standard Python Libraries
 import argparse
+import sys
 import time
 
 # TTSA Includes
-from ttsa import TTSA
+from batch import read_manifest, solve_batch
+from multistart import solve_multistart
+from telemetry import Telemetry
+from tempering import solve_tempering
+from trajectory import TrajectoryLog
+from ttsa import make_solver
 
 
 def main():
@@ -24,6 +30,8 @@ def main():
     parser = argparse.ArgumentParser(description='Traveling Tournament Problem using Simulated Annealing')
     parser.add_argument('-n', '--number_teams', dest='number_teams', metavar='N',
                         type=int, nargs=1 ,help='Provide the number of teams (even) that should be scheduled')
+    parser.add_argument('-i', '--instance', dest='instance', metavar='PATH',
+                        default='data', help='Provide the instance file, or a directory of data{N}.txt files, default: data')
     parser.add_argument('-s', '--seed', dest='seed', metavar='S',
                         type=float, nargs='?', default=0, help='Provide the seed for the PRNG')
     parser.add_argument('-t', '--tau', dest='tau', metavar='T',
@@ -44,13 +52,165 @@ def main():
                         type=int, nargs='?', default=3, help='Provide the value for MaxR, default: 3')
     parser.add_argument('-g', '--gamma', dest='gamma', metavar='G',
                         type=float, nargs='?', default=2, help='Provide the value for Gamma, default: 2')
+    parser.add_argument('--deepcopy', dest='deepcopy', action='store_true',
+                        help='Deepcopy the schedule before every move instead of applying and undoing moves in place')
+    parser.add_argument('--builder', dest='builder', choices=['circle', 'backtrack'], default='circle',
+                        help='Starting schedule: circle method or recursive backtracking, default: circle')
+    parser.add_argument('--engine', dest='engine', choices=['list', 'numpy'], default='list',
+                        help='Schedule representation: list of (opponent, home/away) tuples or a NumPy array, default: list')
+
+    parser.add_argument('--selection', dest='selection', choices=['uniform', 'adaptive'], default='uniform',
+                        help='Choose the moves uniformly or by their recent improvement per second, default: uniform')
+    parser.add_argument('--selection-floor', dest='selection_floor', metavar='P', type=float, default=0.05,
+                        help='Smallest probability of any move with adaptive selection, default: 0.05')
+
+    parser.add_argument('--candidates', dest='candidates', metavar='K', type=int, default=1,
+                        help='Propose batches of up to K moves once a phase rejects most proposals, default: 1 (off)')
+    parser.add_argument('--candidate-mode', dest='candidate_mode', choices=['first', 'best'], default='first',
+                        help='Take the first accepted candidate, exactly like single proposals, or the best of each batch, default: first')
+    parser.add_argument('--candidates-below', dest='candidates_below', metavar='R', type=float, default=0.2,
+                        help='Batch the proposals after a phase accepting less than this ratio of them, default: 0.2')
+
+    parser.add_argument('--starts', dest='starts', metavar='K', type=int,
+                        help='Run K independent chains with the seeds 1..K, or on substreams 1..K of a given --seed, on a process pool')
+    parser.add_argument('--seeds', dest='seeds', metavar='S', type=int, nargs='+',
+                        help='Run an independent chain for each of these seeds on a process pool')
+    parser.add_argument('-w', '--workers', dest='workers', metavar='W', type=int,
+                        help='Number of worker processes for --starts/--seeds, default: number of CPUs')
+    parser.add_argument('--target', dest='target', metavar='COST', type=int,
+                        help='Stop once a feasible schedule costing at most COST is found')
+
+    parser.add_argument('--gap', dest='gap', metavar='PCT', type=float,
+                        help='Stop once a feasible schedule within PCT percent of the independent lower bound is found')
+
+    parser.add_argument('--batch', dest='batch', metavar='MANIFEST',
+                        help='Solve every job of a JSON or CSV manifest on a pool of -w workers, printing a JSON line per job')
+    parser.add_argument('--batch-output', dest='batch_output', metavar='FILE',
+                        help='Write the JSON lines of --batch to FILE instead of stdout')
+
+    parser.add_argument('--tempering', dest='tempering', metavar='K', type=int,
+                        help='Run parallel tempering with K replicas from Tau down to --tmin instead of annealing')
+    parser.add_argument('--tmin', dest='tmin', metavar='T', type=float, default=10,
+                        help='Coldest parallel tempering temperature, default: 10')
+    parser.add_argument('--steps', dest='steps', metavar='N', type=int, default=1000,
+                        help='Steps every replica runs between exchanges, default: 1000')
+    parser.add_argument('--exchanges', dest='exchanges', metavar='N', type=int,
+                        help='Number of parallel tempering exchanges, default: 100, or no limit with --seconds or --iterations')
+
+    parser.add_argument('--seconds', dest='seconds', metavar='S', type=float,
+                        help='Stop after S seconds and report the best schedule found so far, per chain with --starts/--seeds')
+    parser.add_argument('--iterations', dest='iterations', metavar='N', type=int,
+                        help='Stop after N iterations and report the best schedule found so far, per chain with --starts/--seeds and per replica with --tempering')
+    parser.add_argument('--telemetry', dest='telemetry', metavar='FILE',
+                        help='Write per-move statistics and per-phase snapshots to FILE as JSON lines')
+    parser.add_argument('--trajectory', dest='trajectory', metavar='FILE',
+                        help='Log every accepted move to the binary FILE, replay it with trajectory.py. A resumed run continues the log')
+    parser.add_argument('--cache', dest='cache', metavar='N', type=int, default=0,
+                        help='Keep the cost and violations of the last N distinct schedules to skip re-evaluating them, default: 0 (off)')
+    parser.add_argument('--checkpoint', dest='checkpoint', metavar='FILE',
+                        help='Periodically save the annealing state to FILE')
+    parser.add_argument('--checkpoint-every', dest='checkpoint_every', metavar='N', type=int,
+                        help='Save a checkpoint every N iterations')
+    parser.add_argument('--checkpoint-seconds', dest='checkpoint_seconds', metavar='S', type=float, default=60,
+                        help='Save a checkpoint every S seconds, default: 60')
+    parser.add_argument('--resume', dest='resume', metavar='FILE',
+                        help='Continue the run saved in the checkpoint FILE, with the same seed and parameters')
 
     # Parse the input arguments
     args = parser.parse_args()
 
-    ttsa = TTSA(args.number_teams[0], args.seed, args.tau, args.beta, args.omega, args.delta, args.theta, args.maxc, args.maxp, args.maxr, args.gamma)
+    # The number of teams can be left out when an instance file is given
+    number_teams = args.number_teams[0] if args.number_teams else None
+
+    # Batch mode takes everything from the manifest
+    if args.batch:
+        if args.batch_output:
+            with open(args.batch_output, 'w') as out:
+                solve_batch(read_manifest(args.batch), args.workers, out)
+        else:
+            solve_batch(read_manifest(args.batch), args.workers)
+        return
+
+    # Parallel tempering runs every replica in its own process
+    if args.tempering:
+        if args.candidates > 1:
+            parser.error("--candidates batches the proposals of annealing runs, the --tempering replicas do not use it")
+        tempering(args, number_teams)
+        return
+
+    # Multi-start mode runs the chains in parallel and reports on every seed
+    if args.starts or args.seeds:
+        multistart(args, number_teams)
+        return
+
+    telemetry = Telemetry(args.telemetry) if args.telemetry else None
+    trajectory = TrajectoryLog(args.trajectory, append=args.resume is not None) if args.trajectory else None
+
+    ttsa = make_solver(sa_params(args), args.engine, number_teams, args.seed, in_place=not args.deepcopy,
+                       instance=args.instance, builder=args.builder,
+                       checkpoint=args.checkpoint or args.resume, checkpoint_every=args.checkpoint_every,
+                       checkpoint_seconds=args.checkpoint_seconds, resume=args.resume, telemetry=telemetry,
+                       cache_size=args.cache, selection=args.selection, selection_floor=args.selection_floor,
+                       candidates=args.candidates, candidate_mode=args.candidate_mode,
+                       candidates_below=args.candidates_below, trajectory=trajectory)
+    ttsa.solve(args.seconds, args.iterations, args.target, target_gap=target_gap(args))
+    ttsa.print_result()
+    if telemetry is not None:
+        telemetry.close()
+    if trajectory is not None:
+        trajectory.close()
+
+# The SA parameters from the command line
+def sa_params(args):
+    return {"tau": args.tau, "beta": args.beta, "omega": args.omega, "delta": args.delta, "theta": args.theta,
+            "maxc": args.maxc, "maxp": args.maxp, "maxr": args.maxr, "gamma": args.gamma}
+
+# The target gap as a fraction, from the percentage on the command line
+def target_gap(args):
+    return args.gap / 100 if args.gap is not None else None
+
+# Prints the best schedule and its cost
+def print_best(best_S, best_cost):
+    print("\nThe best feasible schedule:")
+    for row in best_S or []:
+        print(*row, sep="\t")
+    print("\nCost: " + str(best_cost))
+
+def tempering(args, number_teams):
+    seed = int(args.seed) or 1
+    exchanges = args.exchanges
+    if exchanges is None and args.seconds is None and args.iterations is None:
+        exchanges = 100
+    best_S, best_cost, stats = solve_tempering(number_teams, args.tempering, args.tmin, args.tau, args.steps,
+                                               exchanges, args.seconds, seed=seed, instance=args.instance,
+                                               params=sa_params(args), engine=args.engine, builder=args.builder,
+                                               target_cost=args.target, target_gap=target_gap(args),
+                                               iterations=args.iterations, selection=args.selection,
+                                               selection_floor=args.selection_floor)
+
+    # Print out the stats / result
+    print("Temperature\tIterations\tSwaps")
+    for k, (tau, iterations) in enumerate(zip(stats["temperatures"], stats["iterations"])):
+        swaps = "%d/%d" % (stats["swaps_done"][k], stats["swaps_tried"][k]) if k < len(stats["swaps_done"]) else ""
+        print("%.2f" % tau, iterations, swaps, sep="\t")
+    print_best(best_S, best_cost)
+
+def multistart(args, number_teams):
+    params = sa_params(args)
+    best_S, best_cost, stats = solve_multistart(number_teams, args.seeds or args.starts, args.workers, args.instance,
+                                                params, args.engine, args.builder, args.target, int(args.seed) or None,
+                                                target_gap(args), args.seconds, args.iterations, args.selection,
+                                                args.selection_floor, args.candidates, args.candidate_mode,
+                                                args.candidates_below)
+
+    # Print out the stats / result
+    print("Seed\tCost\tIterations\tSeconds\tStopped")
+    for s in stats:
+        print(s["seed"], s["cost"], s["iterations"], "%.2f" % s["seconds"], s["stopped"], sep="\t")
+    print_best(best_S, best_cost)
 
 if __name__ =='__main__':
     start_time = time.time()
     main()
-    print("--- %s seconds ---" % (time.time() - start_time))
+    # On stderr, so the JSON lines of a batch on stdout stay valid
+    print("--- %s seconds ---" % (time.time() - start_time), file=sys.stderr)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+"""multistart.py: Independent TTSA chains for many seeds on a process pool"""
+
+__author__ = "Colin Burgin"
+__copyright__ = "Copyright 2017, Virginia Tech"
+__credits__ = [""]
+__license__ = "MIT"
+__version__ = "1.0"
+__maintainer__ = "Colin Burgin"
+__email__ = "cburgin@vt.edu"
+__status__ = "in progress"
+
+# Standard Python Libraries
+import multiprocessing
+import time
+
+# TTSA Includes
+from bounds import cached_lower_bound
+from instances import load_cost_matrix
+from ttsa import DEFAULT_PARAMS, make_solver
+
+# State every worker process sets up once in init_worker and shares between its chains
+_worker = {}
+
+
+# Runs once in every worker process with the already parsed cost matrix
+def init_worker(cost_matrix, params, options, stop_event):
+    _worker["cost_matrix"] = cost_matrix
+    _worker["params"] = params
+    _worker["options"] = options
+    _worker["stop_event"] = stop_event
+
+# Run a single chain for one seed and return its result and statistics
+def run_seed(seed):
+    params = _worker["params"]
+    options = _worker["options"]
+    stop_event = _worker["stop_event"]
+    stats = {"seed": seed, "cost": None, "feasible": False, "iterations": 0, "seconds": 0.0, "stopped": False}
+
+    # Skip chains that have not started yet once the target was reached
+    if stop_event is not None and stop_event.is_set():
+        stats["stopped"] = True
+        return None, stats
+
+    start_time = time.time()
+    # With a master seed the chain runs on its substream seed of it
+    master_seed = options["master_seed"]
+    ttsa = make_solver(params, options["engine"], seed=seed if master_seed is None else master_seed,
+                       builder=options["builder"], cost_matrix=_worker["cost_matrix"], stop_event=stop_event,
+                       stream=None if master_seed is None else seed, lower_bound=options["lower_bound"],
+                       selection=options["selection"], selection_floor=options["selection_floor"],
+                       candidates=options["candidates"], candidate_mode=options["candidate_mode"],
+                       candidates_below=options["candidates_below"])
+    result = ttsa.solve(options["seconds"], options["iterations"], options["target_cost"], target_gap=options["target_gap"])
+
+    stats["seconds"] = time.time() - start_time
+    stats["iterations"] = result.iterations
+    stats["feasible"] = result.best_feasible_cost is not None
+    stats["cost"] = result.best_feasible_cost
+    stats["stopped"] = stop_event is not None and stop_event.is_set()
+    return result.best_feasible_S, stats
+
+# Solve one instance with independent annealing chains for every seed on a pool of worker processes.
+#   seeds is a list of seeds or a number of chains to run with the seeds 1..seeds. Once a chain finds
+#   a feasible schedule costing at most target_cost, or within target_gap of the lower bound, every other
+#   chain stops. Every chain stops after its own budget of seconds and/or iterations, if given, and
+#   chooses its moves by selection with selection_floor and batches them by candidates,
+#   candidate_mode and candidates_below as in TTSA. Given a master_seed, chain seed
+#   runs on substream seed of it instead, so all chains derive from one seed.
+#   Returns the best feasible schedule as (opponent, "home"/"away") rows, or None when no chain found
+#   one, its cost and the statistics of every seed.
+def solve_multistart(number_teams=None, seeds=8, workers=None, instance=None, params=None,
+                     engine="list", builder="circle", target_cost=None, master_seed=None,
+                     target_gap=None, seconds=None, iterations=None, selection="uniform", selection_floor=0.05,
+                     candidates=1, candidate_mode="first", candidates_below=0.2):
+    if isinstance(seeds, int):
+        seeds = list(range(1, seeds + 1))
+    sa_params = dict(DEFAULT_PARAMS)
+    sa_params.update(params or {})
+    # Parse the matrix, and compute its lower bound for a target gap, once here. The workers get them
+    #   through the pool initializer.
+    cost_matrix = load_cost_matrix(instance, number_teams)
+    options = {"engine": engine, "builder": builder, "target_cost": target_cost, "master_seed": master_seed,
+               "target_gap": target_gap, "seconds": seconds, "iterations": iterations,
+               "selection": selection, "selection_floor": selection_floor, "candidates": candidates,
+               "candidate_mode": candidate_mode, "candidates_below": candidates_below,
+               "lower_bound": cached_lower_bound(cost_matrix) if target_gap is not None else None}
+    stop_event = multiprocessing.Event() if target_cost is not None or target_gap is not None else None
+
+    best_S = None
+    best_cost = None
+    all_stats = []
+    with multiprocessing.Pool(workers, init_worker, (cost_matrix, sa_params, options, stop_event)) as pool:
+        for S, stats in pool.imap_unordered(run_seed, seeds):
+            all_stats.append(stats)
+            if stats["feasible"] and (best_cost is None or stats["cost"] < best_cost):
+                best_S = S
+                best_cost = stats["cost"]
+
+    all_stats.sort(key=lambda s: seeds.index(s["seed"]))
+    return best_S, best_cost, all_stats
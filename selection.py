@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+"""selection.py: Adaptive choice of the TTSA moves by their recent improvement per second"""
+
+__author__ = "Colin Burgin"
+__copyright__ = "Copyright 2017, Virginia Tech"
+__credits__ = [""]
+__license__ = "MIT"
+__version__ = "1.0"
+__maintainer__ = "Colin Burgin"
+__email__ = "cburgin@vt.edu"
+__status__ = "in progress"
+
+# Standard Python Libraries
+import itertools
+
+
+class AdaptiveSelection():
+    """Chooses moves with probabilities that follow how much each one recently improved per CPU second"""
+
+    # Every period moves the probabilities are recomputed from the improvement per second of every
+    #   move, and the totals decay so that older windows count less. No move drops below floor.
+    def __init__(self, rng, count, floor=0.05, period=1000, decay=0.5):
+        if floor < 0 or floor * count > 1:
+            raise ValueError("The selection floor must be between 0 and 1/%d for %d moves, not %g" % (count, count, floor))
+        self.rng = rng
+        self.floor = floor
+        self.period = period
+        self.decay = decay
+        self.improvement = [0.0] * count
+        self.seconds = [0.0] * count
+        self.weights = [1.0 / count] * count
+        self.cumulative = list(itertools.accumulate(self.weights))
+        self.until_update = period
+
+    # The index of the next move
+    def choose(self):
+        u = self.rng.random()
+        for k, c in enumerate(self.cumulative):
+            if u < c:
+                return k
+        return len(self.cumulative) - 1
+
+    # Record the seconds a move took and how much it lowered the TTSA cost, negative for worse
+    def record(self, move, seconds, improvement):
+        self.seconds[move] += seconds
+        if improvement > 0:
+            self.improvement[move] += improvement
+        self.until_update -= 1
+        if self.until_update == 0:
+            self.update()
+
+    # Recompute the probabilities, keeping the old ones when no move improved in the window
+    def update(self):
+        rates = [i / s if s > 0 else 0.0 for i, s in zip(self.improvement, self.seconds)]
+        total = sum(rates)
+        if total > 0:
+            share = 1 - self.floor * len(rates)
+            self.weights = [self.floor + share * r / total for r in rates]
+            self.cumulative = list(itertools.accumulate(self.weights))
+        self.improvement = [i * self.decay for i in self.improvement]
+        self.seconds = [s * self.decay for s in self.seconds]
+        self.until_update = self.period
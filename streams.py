@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+"""streams.py: Per-solver random number streams for TTSA, drawn in blocks"""
+
+__author__ = "Colin Burgin"
+__copyright__ = "Copyright 2017, Virginia Tech"
+__credits__ = [""]
+__license__ = "MIT"
+__version__ = "1.0"
+__maintainer__ = "Colin Burgin"
+__email__ = "cburgin@vt.edu"
+__status__ = "in progress"
+
+# Standard Python Libraries
+import random
+
+# Uniforms drawn at a time
+BLOCK = 4096
+
+
+class RandomStream():
+    """A solver's own generator, handing out uniforms pre-drawn in blocks and the integers the moves need"""
+
+    # A seed of None draws a fresh seed from the operating system. With an index the stream is
+    #   substream index of the master seed, every index giving an independent, reproducible stream.
+    def __init__(self, seed=None, index=None, block=BLOCK):
+        if seed is not None and index is not None:
+            seed = "%s/%d" % (seed, index)
+        self.prng = random.Random(seed)
+        self.block = block
+        self.values = iter(())
+
+    # The next uniform in [0, 1)
+    def random(self):
+        u = next(self.values, None)
+        if u is None:
+            draw = self.prng.random
+            self.values = iter([draw() for i in range(self.block)])
+            u = next(self.values)
+        return u
+
+    # A random int in range(k)
+    def below(self, k):
+        return int(self.random() * k)
+
+    # Two distinct random ints in range(k)
+    def pair(self, k):
+        a = int(self.random() * k)
+        b = int(self.random() * (k - 1))
+        if b >= a:
+            b += 1
+        return a, b
+
+    # A random element of a sequence
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+    # Shuffle a list in place, only the builders need it so it draws from the generator directly
+    def shuffle(self, x):
+        self.prng.shuffle(x)
+
+    # A random permutation of range(k)
+    def permutation(self, k):
+        order = list(range(k))
+        self.prng.shuffle(order)
+        return order
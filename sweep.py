@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+
+"""sweep.py: Cached parallel sweeps of the TTSA parameters over instances and seeds"""
+
+__author__ = "Colin Burgin"
+__copyright__ = "Copyright 2017, Virginia Tech"
+__credits__ = [""]
+__license__ = "MIT"
+__version__ = "1.0"
+__maintainer__ = "Colin Burgin"
+__email__ = "cburgin@vt.edu"
+__status__ = "in progress"
+
+# Standard Python Libraries
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+
+# TTSA Includes
+from batch import PARAM_TYPES, cached_matrix
+from instances import instance_path, load_cost_matrix
+from ttsa import DEFAULT_PARAMS, make_solver
+
+# The modules whose code decides the result of a run, a change to any of them starts a fresh cache
+SOLVER_SOURCES = ["ttsa.py", "ttsa_numpy.py", "streams.py", "bounds.py", "selection.py"]
+
+# Where the results of finished runs are kept between sweeps
+CACHE_DIR = ".sweep_cache"
+
+
+# Hash of the solver code, part of the cache key of every run
+def code_version():
+    digest = hashlib.sha256()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in SOLVER_SOURCES:
+        with open(os.path.join(here, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+# Hash of the cost matrix of an instance, so renaming or moving the file keeps its cached runs
+def instance_hash(cost_matrix):
+    rows = cost_matrix.tolist() if hasattr(cost_matrix, "tolist") else cost_matrix
+    return hashlib.sha256(json.dumps(rows).encode()).hexdigest()[:16]
+
+# Read a sweep spec. The JSON object has "instances", a list of instance paths or of objects with
+#   "instance" and "number_teams", "params", the values of every swept SA parameter, and "seeds", a
+#   list of seeds or a number of seeds 1..seeds. With "mode": "grid" (the default) every parameter
+#   has a list of values and every combination is run. With "mode": "random" a parameter is a list
+#   to choose from or an object with "min", "max" and optionally "log": true, and "samples"
+#   configurations are drawn with "sample_seed". The budget of every run is "seconds" and/or
+#   "iterations", and "engine", "builder", "target_cost" and "target_gap" are optional.
+def read_spec(file_name):
+    with open(file_name, 'r') as f:
+        spec = json.load(f)
+    if not spec.get("instances"):
+        raise ValueError("The sweep %s has no instances" % file_name)
+    unknown = set(spec.get("params", {})) - set(PARAM_TYPES)
+    if unknown:
+        raise ValueError("The sweep %s has unknown parameters %s" % (file_name, ", ".join(sorted(unknown))))
+    if spec.get("mode", "grid") not in ("grid", "random"):
+        raise ValueError("Unknown sweep mode " + spec["mode"] + ", expected grid or random")
+    if spec.get("seconds") is None and spec.get("iterations") is None:
+        raise ValueError("The sweep %s needs a budget of seconds or iterations for every run" % file_name)
+    return spec
+
+# Draw one value of a random search parameter
+def sample_value(name, space, prng):
+    if isinstance(space, list):
+        return prng.choice(space)
+    low, high = space["min"], space["max"]
+    if space.get("log", False):
+        value = math.exp(prng.uniform(math.log(low), math.log(high)))
+    else:
+        value = prng.uniform(low, high)
+    return int(round(value)) if PARAM_TYPES[name] is int else value
+
+# The complete SA parameters of every configuration of a spec, the unswept ones at their defaults
+def configurations(spec):
+    space = spec.get("params", {})
+    names = sorted(space)
+    if spec.get("mode", "grid") == "grid":
+        space = {name: values if isinstance(values, list) else [values] for name, values in space.items()}
+        points = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+    else:
+        prng = random.Random(spec.get("sample_seed", 1))
+        points = [{name: sample_value(name, space[name], prng) for name in names} for i in range(spec.get("samples", 10))]
+
+    configs = []
+    for point in points:
+        params = dict(DEFAULT_PARAMS)
+        params.update({name: PARAM_TYPES[name](value) for name, value in point.items()})
+        if params not in configs:
+            configs.append(params)
+    return configs
+
+# The seeds of a spec
+def sweep_seeds(spec):
+    seeds = spec.get("seeds", 1)
+    return list(range(1, seeds + 1)) if isinstance(seeds, int) else seeds
+
+# Every run of a spec, one per instance, configuration and seed, each with the key of its cached result
+def expand(spec, version=None):
+    version = version or code_version()
+    configs = configurations(spec)
+    runs = []
+    for entry in spec["instances"]:
+        if not isinstance(entry, dict):
+            entry = {"instance": entry}
+        # A directory is resolved to the data{N}.txt file, so every instance is labelled by its own file
+        file_name = instance_path(entry["instance"], entry.get("number_teams"))
+        cost_matrix = load_cost_matrix(file_name, entry.get("number_teams"))
+        matrix_hash = instance_hash(cost_matrix)
+        for params in configs:
+            for seed in sweep_seeds(spec):
+                run = {"instance": file_name, "number_teams": len(cost_matrix), "instance_hash": matrix_hash,
+                       "params": params, "seed": seed, "seconds": spec.get("seconds"), "iterations": spec.get("iterations"),
+                       "engine": spec.get("engine", "list"), "builder": spec.get("builder", "circle"), "code_version": version}
+                run["key"] = run_key(run)
+                runs.append(run)
+    return runs
+
+# The cache key of a run: everything that decides its result, but not where the instance file is
+def run_key(run):
+    fields = {name: run[name] for name in ("instance_hash", "params", "seed", "seconds", "iterations",
+                                           "engine", "builder", "code_version")}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+# Path of the cached result of a run
+def cached_path(cache_dir, key):
+    return os.path.join(cache_dir, key[:2], key + ".json")
+
+# The cached result of a run, None when it has not finished before
+def load_cached(cache_dir, key):
+    try:
+        with open(cached_path(cache_dir, key), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# Atomically store the result of a run, so an interrupted sweep never leaves a partial result behind
+def store_cached(cache_dir, record):
+    file_name = cached_path(cache_dir, record["key"])
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    tmp_name = "%s.%d.tmp" % (file_name, os.getpid())
+    with open(tmp_name, 'w') as f:
+        json.dump(record, f)
+    os.replace(tmp_name, file_name)
+
+# Run one cell of the sweep. Besides the best costs, the run keeps the wall time and iteration at
+#   which every better feasible cost was found, checked every callback_every iterations, so the time
+#   to any target can be read off later without running again.
+def run_cell(run, callback_every=1000):
+    record = dict(run)
+    try:
+        cost_matrix, lower_bound = cached_matrix(run["instance"], run["number_teams"])
+        ttsa = make_solver(run["params"], run["engine"], seed=run["seed"], builder=run["builder"],
+                           cost_matrix=cost_matrix, lower_bound=lower_bound, verbose=False)
+        trace = []
+        start_time = time.time()
+
+        def progress(result):
+            if result.best_feasible_cost is not None and (not trace or result.best_feasible_cost < trace[-1][2]):
+                trace.append([time.time() - start_time, result.iterations, result.best_feasible_cost])
+
+        result = ttsa.solve(run["seconds"], run["iterations"], callback=progress, callback_every=callback_every)
+        progress(result)
+    except Exception as e:
+        record["error"] = "%s: %s" % (type(e).__name__, e)
+        return record
+
+    record.update({"cost": result.best_feasible_cost, "infeasible_cost": result.best_infeasible_cost,
+                   "lower_bound": lower_bound, "gap": result.gap, "solve_iterations": result.iterations,
+                   "solve_seconds": result.seconds, "finished": result.finished, "trace": trace})
+    return record
+
+# Run every cell of a sweep that is not in the cache on a pool of worker processes, storing each
+#   result as soon as it finishes. Returns the records of all cells, cached and new, in the order of
+#   runs. Failed runs are returned with their error but not cached, so the next sweep retries them.
+def run_sweep(runs, cache_dir=CACHE_DIR, workers=None, log=sys.stderr):
+    records = {}
+    todo = {}
+    for run in runs:
+        cached = load_cached(cache_dir, run["key"])
+        if cached is not None:
+            records[run["key"]] = dict(cached, instance=run["instance"])
+        else:
+            todo.setdefault(run["key"], run)
+    if log is not None:
+        log.write("%d runs, %d cached, %d to run\n" % (len(runs), len(runs) - len(todo), len(todo)))
+
+    if todo:
+        with multiprocessing.Pool(workers) as pool:
+            for done, record in enumerate(pool.imap_unordered(run_cell, todo.values()), 1):
+                if "error" not in record:
+                    store_cached(cache_dir, record)
+                records[record["key"]] = record
+                if log is not None:
+                    log.write("[%d/%d] %s seed %d: %s\n" % (done, len(todo), record["instance"], record["seed"],
+                                                            record.get("error", record["cost"])))
+    return [records[run["key"]] for run in runs]
+
+# Seconds a run took to find a feasible schedule costing at most target, None when it never did
+def time_to_target(record, target):
+    for seconds, iterations, cost in record.get("trace", []):
+        if cost <= target:
+            return seconds
+    return None
+
+# Summarize the runs of every instance and configuration: how many were feasible, the median and best
+#   cost over the feasible runs, and how many reached the target and their median time to it, the
+#   runs that never reached it counting as never finishing. The target is target_cost, or target_gap
+#   above the lower bound of the instance, and without either the best cost of the whole sweep on it.
+#   Instances are told apart by the hash of their cost matrix and labelled by their file.
+def summarize(records, target_cost=None, target_gap=None):
+    groups = {}
+    for record in records:
+        if "error" in record:
+            continue
+        key = (record["instance_hash"], json.dumps(record["params"], sort_keys=True))
+        groups.setdefault(key, []).append(record)
+
+    targets = {}
+    for (instance, params), group in groups.items():
+        if target_cost is not None:
+            targets[instance] = target_cost
+        elif target_gap is not None:
+            targets[instance] = int(group[0]["lower_bound"] * (1 + target_gap))
+        else:
+            for r in group:
+                if r["cost"] is not None and r["cost"] < targets.get(instance, r["cost"] + 1):
+                    targets[instance] = r["cost"]
+
+    rows = []
+    for (instance, params), group in groups.items():
+        costs = [r["cost"] for r in group if r["cost"] is not None]
+        target = targets.get(instance)
+        times = [time_to_target(r, target) if target is not None else None for r in group]
+        reached = [t for t in times if t is not None]
+        median_time = statistics.median([t if t is not None else math.inf for t in times])
+        rows.append({"instance": group[0]["instance"], "number_teams": group[0]["number_teams"],
+                     "instance_hash": instance, "params": json.loads(params), "runs": len(group), "feasible": len(costs),
+                     "median_cost": statistics.median(costs) if costs else None, "best_cost": min(costs) if costs else None,
+                     "target": target, "reached": len(reached),
+                     "median_time_to_target": median_time if median_time < math.inf else None})
+    rows.sort(key=lambda row: (row["instance"], row["instance_hash"], row["median_cost"] is None, row["median_cost"] or 0, row["best_cost"] or 0))
+    return rows
+
+# Print the summary as a table, with the parameters that differ between the configurations
+def print_summary(rows, out=sys.stdout):
+    swept = sorted(name for name in PARAM_TYPES if len(set(row["params"][name] for row in rows)) > 1)
+    out.write("\t".join(["Instance"] + swept + ["Runs", "Feasible", "Median", "Best", "Target", "Reached", "Median TTT"]) + "\n")
+    for row in rows:
+        ttt = row["median_time_to_target"]
+        out.write("\t".join([str(row["instance"])] + ["%g" % row["params"][name] for name in swept] +
+                            [str(row["runs"]), str(row["feasible"]), str(row["median_cost"]), str(row["best_cost"]),
+                             str(row["target"]), "%d/%d" % (row["reached"], row["runs"]),
+                             "%.2f" % ttt if ttt is not None else "-"]) + "\n")
+
+def main():
+    #Parse the command line arguments provided at run time.
+    parser = argparse.ArgumentParser(description='Cached parallel parameter sweeps for the Traveling Tournament Problem using Simulated Annealing')
+    parser.add_argument('spec', metavar='SPEC', help='JSON sweep spec of the instances, parameters, seeds and budgets')
+    parser.add_argument('-w', '--workers', dest='workers', metavar='W', type=int,
+                        help='Number of worker processes, default: one per CPU')
+    parser.add_argument('--cache', dest='cache', metavar='DIR', default=CACHE_DIR,
+                        help='Directory of the cached run results, default: ' + CACHE_DIR)
+    parser.add_argument('--target', dest='target', metavar='COST', type=int,
+                        help='Cost the time to target is measured to, default: the spec target or the best cost of the sweep')
+    parser.add_argument('--gap', dest='gap', metavar='PCT', type=float,
+                        help='Measure the time to target to within PCT percent of the lower bound instead')
+    parser.add_argument('--dry-run', dest='dry_run', action='store_true',
+                        help='Only count the runs and how many are already cached')
+    parser.add_argument('-o', '--output', dest='output', metavar='FILE',
+                        help='Also write every run and the summary to FILE as JSON')
+    args = parser.parse_args()
+
+    spec = read_spec(args.spec)
+    runs = expand(spec)
+    if args.dry_run:
+        cached = sum(1 for run in runs if os.path.isfile(cached_path(args.cache, run["key"])))
+        print("%d runs, %d cached, %d to run" % (len(runs), cached, len(runs) - cached))
+        return
+
+    records = run_sweep(runs, args.cache, args.workers)
+    target_cost = args.target if args.target is not None else spec.get("target_cost")
+    target_gap = args.gap / 100 if args.gap is not None else spec.get("target_gap")
+    rows = summarize(records, target_cost, target_gap)
+    print_summary(rows)
+    for record in records:
+        if "error" in record:
+            print("Failed: %s seed %d: %s" % (record["instance"], record["seed"], record["error"]))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"runs": records, "summary": rows}, f, indent=1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+"""telemetry.py: Per-move statistics and run telemetry for TTSA, written as JSON lines"""
+
+__author__ = "Colin Burgin"
+__copyright__ = "Copyright 2017, Virginia Tech"
+__credits__ = [""]
+__license__ = "MIT"
+__version__ = "1.0"
+__maintainer__ = "Colin Burgin"
+__email__ = "cburgin@vt.edu"
+__status__ = "in progress"
+
+# Standard Python Libraries
+import json
+import sys
+import time
+
+# TTSA Includes
+from ttsa import MOVE_NAMES
+
+
+class Telemetry():
+    """Counts every proposed move and writes per-phase snapshots of the annealing as JSON lines"""
+
+    def __init__(self, file_name=None, stream=None):
+        # Write to the given stream, a file, or stdout
+        self.own_stream = stream is None and file_name is not None
+        self.out = stream or (open(file_name, 'w') if file_name is not None else sys.stdout)
+        self.start_time = time.time()
+
+        # Per move type totals
+        count = len(MOVE_NAMES)
+        self.proposed = [0] * count
+        self.accepted = [0] * count
+        self.improved = [0] * count
+        self.seconds = [0.0] * count
+        self.delta = [0.0] * count
+        self.accepted_delta = [0.0] * count
+
+        # Proposals and acceptances since the last snapshot
+        self.phase_proposed = 0
+        self.phase_accepted = 0
+
+    # Record one proposed move, the seconds spent applying and evaluating it and the change in TTSA cost
+    def record_move(self, move, seconds, accepted, delta):
+        self.proposed[move] += 1
+        self.seconds[move] += seconds
+        self.delta[move] += delta
+        self.phase_proposed += 1
+        if delta < 0:
+            self.improved[move] += 1
+        if accepted:
+            self.accepted[move] += 1
+            self.accepted_delta[move] += delta
+            self.phase_accepted += 1
+
+    # Write a snapshot of the annealing state with the acceptance ratio since the previous snapshot
+    def snapshot(self, **fields):
+        record = {"type": "phase", "seconds": time.time() - self.start_time}
+        record.update(fields)
+        record["proposed"] = self.phase_proposed
+        record["accepted"] = self.phase_accepted
+        record["acceptance"] = self.phase_accepted / self.phase_proposed if self.phase_proposed else 0.0
+        self.write(record)
+        self.phase_proposed = 0
+        self.phase_accepted = 0
+
+    # The totals of every move type
+    def move_stats(self):
+        stats = []
+        for k, name in enumerate(MOVE_NAMES):
+            proposed = self.proposed[k]
+            stats.append({"move": name, "proposed": proposed, "accepted": self.accepted[k], "improved": self.improved[k],
+                          "seconds": self.seconds[k], "seconds_per_move": self.seconds[k] / proposed if proposed else 0.0,
+                          "mean_delta": self.delta[k] / proposed if proposed else 0.0,
+                          "accepted_delta": self.accepted_delta[k]})
+        return stats
+
+    # Write the move totals, at the end of a solve
+    def summary(self, **fields):
+        record = {"type": "moves", "seconds": time.time() - self.start_time}
+        record.update(fields)
+        record["moves"] = self.move_stats()
+        self.write(record)
+        self.out.flush()
+
+    def write(self, record):
+        self.out.write(json.dumps(record) + "\n")
+
+    def close(self):
+        if self.own_stream:
+            self.out.close()
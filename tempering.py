@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+"""tempering.py: Parallel tempering (replica exchange) over the TTSA moves"""
+
+__author__ = "Colin Burgin"
+__copyright__ = "Copyright 2017, Virginia Tech"
+__credits__ = [""]
+__license__ = "MIT"
+__version__ = "1.0"
+__maintainer__ = "Colin Burgin"
+__email__ = "cburgin@vt.edu"
+__status__ = "in progress"
+
+# Standard Python Libraries
+import math
+import multiprocessing
+import time
+
+# TTSA Includes
+from bounds import cached_lower_bound
+from instances import load_cost_matrix
+from streams import RandomStream
+from ttsa import DEFAULT_PARAMS, decode_schedule, make_solver
+
+
+# Geometric ladder of temperatures from t_min to t_max
+def temperature_ladder(replicas, t_min, t_max):
+    if replicas == 1:
+        return [t_max]
+    return [t_min * (t_max / t_min) ** (k / (replicas - 1)) for k in range(replicas)]
+
+# One replica in its own process, drawing from substream index of the master seed. It keeps its chain
+#   and omega between commands from the coordinator, and schedules only cross the pipe as compact encodings.
+def replica_worker(conn, seed, index, cost_matrix, params, options):
+    ttsa = make_solver(params, options["engine"], seed=seed, builder=options["builder"], cost_matrix=cost_matrix,
+                       verbose=False, stream=index, selection=options["selection"],
+                       selection_floor=options["selection_floor"])
+    ttsa.set_schedule(ttsa.S)
+
+    while True:
+        command = conn.recv()
+        if command[0] == "run":
+            energy, cost, nbv = ttsa.metropolis(command[1], command[2])
+            conn.send((energy, nbv, ttsa.best_feasible_cost))
+        elif command[0] == "get":
+            conn.send(ttsa.encode(ttsa.S))
+        elif command[0] == "set":
+            ttsa.set_schedule(ttsa.decode(command[1]))
+            conn.send(ttsa.penalty_cost(ttsa.cur_cost, ttsa.cur_nbv))
+        elif command[0] == "best":
+            best = ttsa.encode(ttsa.best_feasible_S) if len(ttsa.best_feasible_S) > 0 else None
+            conn.send((best, ttsa.best_feasible_cost if best else None, ttsa.iterations))
+        else:
+            break
+    conn.close()
+
+# Solve one instance with K replicas at a geometric ladder of temperatures between t_min and t_max.
+#   Every replica runs steps Metropolis steps, then neighbouring replicas swap their schedules by the
+#   Metropolis criterion, alternating between the even and odd pairs. The search ends after the given
+#   number of exchanges, after the time budget in seconds, once every replica ran iterations steps, or
+#   once a feasible schedule costing at most target_cost, or within target_gap of the independent lower
+#   bound, is found. exchanges may be None when there is another budget. Every replica chooses its
+#   moves by selection with selection_floor as in TTSA. Returns the best feasible schedule as
+#   (opponent, "home"/"away") rows, or None when no replica found one, its cost and the run statistics.
+def solve_tempering(number_teams=None, replicas=4, t_min=10, t_max=400, steps=1000, exchanges=100,
+                    seconds=None, seed=1, instance=None, params=None, engine="list", builder="circle",
+                    target_cost=None, target_gap=None, iterations=None, selection="uniform", selection_floor=0.05):
+    if exchanges is None and seconds is None and iterations is None:
+        raise ValueError("Parallel tempering needs a budget of exchanges, seconds or iterations")
+    sa_params = dict(DEFAULT_PARAMS)
+    sa_params.update(params or {})
+    options = {"engine": engine, "builder": builder, "selection": selection, "selection_floor": selection_floor}
+    cost_matrix = load_cost_matrix(instance, number_teams)
+    number_teams = len(cost_matrix)
+    temperatures = temperature_ladder(replicas, t_min, t_max)
+    prng = RandomStream(seed, replicas)
+    if target_gap is not None:
+        gap_cost = cached_lower_bound(cost_matrix) * (1 + target_gap)
+        target_cost = gap_cost if target_cost is None else max(target_cost, gap_cost)
+
+    # Start every replica with its own substream and starting schedule, the coordinator draws from the next one
+    conns = []
+    processes = []
+    for k in range(replicas):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        p = multiprocessing.Process(target=replica_worker, args=(child_conn, seed, k, cost_matrix, sa_params, options))
+        p.start()
+        child_conn.close()
+        conns.append(parent_conn)
+        processes.append(p)
+
+    start_time = time.time()
+    swaps_tried = [0] * (replicas - 1)
+    swaps_done = [0] * (replicas - 1)
+    exchange = 0
+    try:
+        while exchanges is None or exchange < exchanges:
+            # Run every replica at its temperature in parallel, the last run only up to the iterations
+            run_steps = steps if iterations is None else min(steps, iterations - exchange * steps)
+            for conn, tau in zip(conns, temperatures):
+                conn.send(("run", run_steps, tau))
+            energies = [conn.recv() for conn in conns]
+            best_cost = min(best for energy, nbv, best in energies)
+
+            # Swap neighbouring replicas, the even pairs on even exchanges and the odd ones on odd exchanges
+            for k in range(exchange % 2, replicas - 1, 2):
+                swaps_tried[k] += 1
+                e_cold = energies[k][0]
+                e_hot = energies[k + 1][0]
+                exponent = (e_cold - e_hot) * (1 / temperatures[k] - 1 / temperatures[k + 1])
+                if exponent >= 0 or math.exp(exponent) > prng.random():
+                    swaps_done[k] += 1
+                    conns[k].send(("get",))
+                    conns[k + 1].send(("get",))
+                    cold_S = conns[k].recv()
+                    hot_S = conns[k + 1].recv()
+                    conns[k].send(("set", hot_S))
+                    conns[k + 1].send(("set", cold_S))
+                    energies[k], energies[k + 1] = ((conns[k].recv(),) + energies[k + 1][1:],
+                                                    (conns[k + 1].recv(),) + energies[k][1:])
+
+            exchange += 1
+            if target_cost is not None and best_cost <= target_cost:
+                break
+            if seconds is not None and time.time() - start_time >= seconds:
+                break
+            if iterations is not None and exchange * steps >= iterations:
+                break
+
+        # Collect the best feasible schedule of every replica
+        best_S = None
+        best_cost = None
+        iterations = []
+        for conn in conns:
+            conn.send(("best",))
+            data, cost, replica_iterations = conn.recv()
+            iterations.append(replica_iterations)
+            if data is not None and (best_cost is None or cost < best_cost):
+                best_S = decode_schedule(data, number_teams)
+                best_cost = cost
+    finally:
+        for conn in conns:
+            conn.send(("stop",))
+        for p in processes:
+            p.join()
+
+    stats = {"temperatures": temperatures, "exchanges": exchange, "swaps_tried": swaps_tried,
+             "swaps_done": swaps_done, "iterations": iterations, "seconds": time.time() - start_time}
+    return best_S, best_cost, stats
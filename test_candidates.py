@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+"""test_candidates.py: Candidate batches never lose a new best schedule and do not depend on where a run is cut"""
+
+__author__ = "Colin Burgin"
+__copyright__ = "Copyright 2017, Virginia Tech"
+__credits__ = [""]
+__license__ = "MIT"
+__version__ = "1.0"
+__maintainer__ = "Colin Burgin"
+__email__ = "cburgin@vt.edu"
+__status__ = "in progress"
+
+# Standard Python Libraries
+import sys
+
+import pytest
+
+# NumPy is optional, the NumPy engine is only checked when it is installed
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# TTSA Includes
+from ttsa import make_solver
+
+# Engines to check
+ENGINES = ["list", pytest.param("numpy", marks=pytest.mark.skipif(np is None, reason="NumPy is not installed"))]
+
+# Short annealing loops, so the run goes through several phases and reheats and then finishes
+PARAMS = {"maxc": 50, "maxp": 30, "maxr": 2}
+
+# Candidates per batch and the iterations the split runs are cut after
+CANDIDATES = 16
+SPLIT = 3000
+
+
+def make_run(engine, candidates=CANDIDATES, candidate_mode="best"):
+    return make_solver(PARAMS, engine, 6, 5, instance="data", verbose=False, candidates=candidates,
+                       candidate_mode=candidate_mode)
+
+# Everything that decides how a run goes on and what it reports
+def run_state(ttsa):
+    return {"S": ttsa.to_list(ttsa.S), "omega": ttsa.omega, "iterations": ttsa.iterations,
+            "best_feasible_cost": ttsa.best_feasible_cost, "best_infeasible_cost": ttsa.best_infeasible_cost,
+            "best_feasible_S": ttsa.to_list(ttsa.best_feasible_S)}
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_first_candidate_matches_single_proposals(engine):
+    single = make_run(engine, candidates=1)
+    single.solve()
+    batched = make_run(engine, candidate_mode="first")
+    batched.solve()
+    assert run_state(batched) == run_state(single)
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_best_candidate_never_loses_a_new_best(engine):
+    ttsa = make_run(engine)
+
+    # Track the cheapest feasible schedule any proposal, batched or not, ever reached
+    cheapest = [sys.maxsize]
+    batches = [0]
+    evaluate, propose_candidates = ttsa.evaluate, ttsa.propose_candidates
+    def tracked_evaluate(S, undo):
+        d_cost, d_nbv = evaluate(S, undo)
+        if ttsa.cur_nbv + d_nbv == 0:
+            cheapest[0] = min(cheapest[0], ttsa.cur_cost + d_cost)
+        return d_cost, d_nbv
+    def tracked_propose_candidates(*args):
+        batches[0] += 1
+        return propose_candidates(*args)
+    ttsa.evaluate = tracked_evaluate
+    ttsa.propose_candidates = tracked_propose_candidates
+    ttsa.solve()
+
+    assert batches[0] > 0
+    assert ttsa.best_feasible_cost == cheapest[0]
+    assert ttsa.cost(ttsa.best_feasible_S) == cheapest[0]
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_best_candidate_does_not_depend_on_cuts(engine):
+    whole = make_run(engine)
+    whole.solve()
+
+    # Callbacks every few iterations and a solve split in two run the same batches
+    reported = make_run(engine)
+    reported.solve(callback=lambda result: None, callback_every=7)
+    assert run_state(reported) == run_state(whole)
+
+    split = make_run(engine)
+    split.solve(iterations=SPLIT)
+    split.solve()
+    assert run_state(split) == run_state(whole)
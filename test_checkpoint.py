@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+"""test_checkpoint.py: A run resumed from a checkpoint continues exactly like the uninterrupted run"""
+
+__author__ = "Colin Burgin"
+__copyright__ = "Copyright 2017, Virginia Tech"
+__credits__ = [""]
+__license__ = "MIT"
+__version__ = "1.0"
+__maintainer__ = "Colin Burgin"
+__email__ = "cburgin@vt.edu"
+__status__ = "in progress"
+
+# Standard Python Libraries
+import pytest
+
+# NumPy is optional, the NumPy engine is only checked when it is installed
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# TTSA Includes
+from ttsa import make_solver
+
+# Engines to check
+ENGINES = ["list", pytest.param("numpy", marks=pytest.mark.skipif(np is None, reason="NumPy is not installed"))]
+
+# Short annealing loops, so the run goes through several phases and reheats within the iterations
+PARAMS = {"maxc": 50, "maxp": 30, "maxr": 2}
+
+# Iterations of the whole run and the checkpoint it is interrupted after
+ITERATIONS = 6000
+CHECKPOINT_EVERY = 2500
+
+
+def make_run(engine, cache_size, **options):
+    return make_solver(PARAMS, engine, 6, 5, instance="data", verbose=False, cache_size=cache_size, **options)
+
+# Everything that decides how a run goes on and what it reports
+def run_state(ttsa):
+    return {"S": ttsa.to_list(ttsa.S), "omega": ttsa.omega, "iterations": ttsa.iterations,
+            "best_feasible_cost": ttsa.best_feasible_cost, "best_infeasible_cost": ttsa.best_infeasible_cost,
+            "best_feasible_S": ttsa.to_list(ttsa.best_feasible_S) if len(ttsa.best_feasible_S) > 0 else [],
+            "best_infeasible_S": ttsa.to_list(ttsa.best_infeasible_S) if len(ttsa.best_infeasible_S) > 0 else [],
+            "loop_state": ttsa.loop_state}
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("cache_size", [0, 1000])
+def test_resume_matches_uninterrupted_run(engine, cache_size, tmp_path):
+    full = make_run(engine, cache_size)
+    full.solve(iterations=ITERATIONS)
+
+    # The interrupted run gets past its checkpoint and is then lost
+    checkpoint = str(tmp_path / "run.ckpt")
+    make_run(engine, cache_size, checkpoint=checkpoint, checkpoint_every=CHECKPOINT_EVERY).solve(iterations=CHECKPOINT_EVERY + 500)
+
+    resumed = make_run(engine, cache_size, checkpoint=checkpoint, resume=checkpoint)
+    assert resumed.iterations == CHECKPOINT_EVERY
+    resumed.solve(iterations=ITERATIONS - resumed.iterations)
+
+    assert run_state(resumed) == run_state(full)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+"""test_delta_eval.py: The incremental evaluation of every move agrees with evaluating the whole schedule"""
+
+__author__ = "Colin Burgin"
+__copyright__ = "Copyright 2017, Virginia Tech"
+__credits__ = [""]
+__license__ = "MIT"
+__version__ = "1.0"
+__maintainer__ = "Colin Burgin"
+__email__ = "cburgin@vt.edu"
+__status__ = "in progress"
+
+# Standard Python Libraries
+import random
+
+import pytest
+
+# NumPy is optional, the NumPy engine is only checked when it is installed
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# TTSA Includes
+from ttsa import MOVE_NAMES, make_solver
+
+# Engines to check
+ENGINES = ["list", pytest.param("numpy", marks=pytest.mark.skipif(np is None, reason="NumPy is not installed"))]
+
+# Moves tried on every instance, about half of them kept so the schedule wanders into infeasible ones
+MOVES = 1500
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("move", MOVE_NAMES)
+@pytest.mark.parametrize("number_teams", [4, 8, 12, 16])
+def test_delta_eval_matches_full_evaluation(engine, move, number_teams):
+    ttsa = make_solver(None, engine, number_teams, 1, instance="data", verbose=False)
+    ttsa.set_schedule(ttsa.S)
+    S = ttsa.S
+    apply = getattr(ttsa, move)
+    prng = random.Random(number_teams)
+    for i in range(MOVES):
+        before = ttsa.snapshot(S)
+        undo = apply(S)
+        d_cost, d_nbv = ttsa.delta_eval(S, undo)
+        assert ttsa.cost(S) == ttsa.cur_cost + d_cost
+        assert ttsa.nbv(S) == ttsa.cur_nbv + d_nbv
+        if prng.random() < 0.5:
+            ttsa.undo_move(S, undo)
+            assert ttsa.to_list(S) == ttsa.to_list(before)
+        else:
+            ttsa.cur_cost += d_cost
+            ttsa.cur_nbv += d_nbv
+
+    # The index was kept up to date through all the moves and roll backs
+    where = ttsa.where
+    ttsa.index_schedule(S)
+    if engine == "numpy":
+        assert (where == ttsa.where).all()
+    else:
+        assert where == ttsa.where
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+"""test_trajectory.py: Replaying a trajectory log rebuilds the schedule of the run that wrote it"""
+
+__author__ = "Colin Burgin"
+__copyright__ = "Copyright 2017, Virginia Tech"
+__credits__ = [""]
+__license__ = "MIT"
+__version__ = "1.0"
+__maintainer__ = "Colin Burgin"
+__email__ = "cburgin@vt.edu"
+__status__ = "in progress"
+
+# Standard Python Libraries
+import pytest
+
+# NumPy is optional, the NumPy engine is only checked when it is installed
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# TTSA Includes
+from instances import load_cost_matrix
+from trajectory import TrajectoryLog, read_trajectory, replay
+from ttsa import make_solver
+
+# Engines to check
+ENGINES = ["list", pytest.param("numpy", marks=pytest.mark.skipif(np is None, reason="NumPy is not installed"))]
+
+# Short annealing loops, so the run goes through several phases and reheats within the iterations
+PARAMS = {"maxc": 50, "maxp": 30, "maxr": 2}
+
+# Iterations of the whole run and the checkpoint it is interrupted after
+ITERATIONS = 6000
+CHECKPOINT_EVERY = 2500
+
+
+def make_run(engine, trajectory, **options):
+    return make_solver(PARAMS, engine, 6, 5, instance="data", verbose=False, trajectory=trajectory, **options)
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_replay_ends_on_the_final_schedule(engine, tmp_path):
+    log = str(tmp_path / "run.trj")
+    trajectory = TrajectoryLog(log)
+    ttsa = make_run(engine, trajectory)
+    ttsa.solve(iterations=ITERATIONS)
+    trajectory.close()
+
+    # Every replayed move is checked against the logged cost and violations on the way
+    S, last = replay(log, cost_matrix=load_cost_matrix("data", 6))
+    assert S == ttsa.to_list(ttsa.S)
+    assert (last["cost"], last["violations"]) == (ttsa.cur_cost, ttsa.cur_nbv)
+
+    # Replaying up to an iteration stops at the last move accepted by then
+    records = read_trajectory(log)[3]
+    middle = records[len(records) // 2]
+    S, last = replay(log, iteration=middle["iteration"])
+    assert last == middle
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_resumed_log_matches_uninterrupted_log(engine, tmp_path):
+    full_log = str(tmp_path / "full.trj")
+    trajectory = TrajectoryLog(full_log)
+    make_run(engine, trajectory).solve(iterations=ITERATIONS)
+    trajectory.close()
+
+    # The interrupted run logs moves past its checkpoint, the resumed one drops them and logs them again
+    log = str(tmp_path / "resumed.trj")
+    checkpoint = str(tmp_path / "run.ckpt")
+    trajectory = TrajectoryLog(log)
+    make_run(engine, trajectory, checkpoint=checkpoint, checkpoint_every=CHECKPOINT_EVERY).solve(iterations=CHECKPOINT_EVERY + 500)
+    trajectory.close()
+
+    trajectory = TrajectoryLog(log, append=True)
+    resumed = make_run(engine, trajectory, checkpoint=checkpoint, resume=checkpoint)
+    resumed.solve(iterations=ITERATIONS - resumed.iterations)
+    trajectory.close()
+
+    with open(full_log, 'rb') as f, open(log, 'rb') as g:
+        assert f.read() == g.read()
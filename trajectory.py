@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+"""trajectory.py: Compact binary log of the accepted TTSA moves and a tool to replay it"""
+
+__author__ = "Colin Burgin"
+__copyright__ = "Copyright 2017, Virginia Tech"
+__credits__ = [""]
+__license__ = "MIT"
+__version__ = "1.0"
+__maintainer__ = "Colin Burgin"
+__email__ = "cburgin@vt.edu"
+__status__ = "in progress"
+
+# Standard Python Libraries
+import argparse
+import os
+import struct
+
+# TTSA Includes
+from ttsa import MOVE_NAMES, decode_schedule, make_solver
+
+# File header: magic, number of teams and the iteration the starting schedule, which follows, is at
+MAGIC = b"TTSATRJ1"
+HEADER = struct.Struct("<8sHQ")
+
+# One accepted move: iteration, move index, up to 3 move parameters (-1 when unused), travel cost,
+#   violations after it, and the tau and omega it was accepted at
+RECORD = struct.Struct("<QB3hqidd")
+
+# Bytes buffered before they are written out
+BUFFER = 1 << 16
+
+
+class TrajectoryLog():
+    """Append-only log of the accepted moves of one annealing run"""
+
+    # The log is opened by the solver when its annealing starts. With append an existing log is
+    #   continued, so that a run resumed from a checkpoint keeps logging to the same file.
+    def __init__(self, file_name, append=False):
+        self.file_name = file_name
+        self.append = append
+        self.out = None
+
+    # Open the log at the solver's current iteration. A new log starts with the current schedule S,
+    #   given as its compact encoding. A continued log drops every record past iteration, the moves
+    #   after the checkpoint being resumed, so that they are not logged twice.
+    def start(self, number_teams, S, iteration=0):
+        if self.out is not None:
+            return
+        if self.append and os.path.isfile(self.file_name) and os.path.getsize(self.file_name) > 0:
+            keep = header_size(number_teams)
+            with open(self.file_name, 'rb') as f:
+                if read_header(f)[0] != number_teams:
+                    raise ValueError("The trajectory log %s is not for %d teams" % (self.file_name, number_teams))
+                while True:
+                    data = f.read(RECORD.size)
+                    if len(data) < RECORD.size or RECORD.unpack(data)[0] > iteration:
+                        break
+                    keep += RECORD.size
+            self.out = open(self.file_name, 'r+b', buffering=BUFFER)
+            self.out.truncate(keep)
+            self.out.seek(keep)
+        else:
+            self.out = open(self.file_name, 'wb', buffering=BUFFER)
+            self.out.write(HEADER.pack(MAGIC, number_teams, iteration))
+            self.out.write(S)
+
+    # Append one accepted move
+    def record(self, iteration, move, params, cost, violations, tau, omega):
+        p = tuple(params) + (-1,) * (3 - len(params))
+        self.out.write(RECORD.pack(iteration, move, p[0], p[1], p[2], int(cost), violations, tau, omega))
+
+    def flush(self):
+        if self.out is not None:
+            self.out.flush()
+
+    def close(self):
+        if self.out is not None:
+            self.out.close()
+            self.out = None
+
+# Size of the header and starting schedule of a log for a number of teams
+def header_size(number_teams):
+    return HEADER.size + 2 * number_teams * (2 * number_teams - 2)
+
+# Read the header of a log, returns the number of teams, the starting iteration and the starting schedule
+def read_header(f):
+    magic, number_teams, iteration = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("Not a TTSA trajectory log: " + f.name)
+    S = decode_schedule(f.read(header_size(number_teams) - HEADER.size), number_teams)
+    return number_teams, iteration, S
+
+# Read a whole log. Returns the number of teams, the starting iteration, the starting schedule as
+#   (opponent, "home"/"away") rows and the records as dicts. A record cut short at the end of the
+#   file, from a run that was killed, is ignored.
+def read_trajectory(file_name):
+    records = []
+    with open(file_name, 'rb') as f:
+        number_teams, iteration, S = read_header(f)
+        while True:
+            data = f.read(RECORD.size)
+            if len(data) < RECORD.size:
+                break
+            it, move, p0, p1, p2, cost, violations, tau, omega = RECORD.unpack(data)
+            params = tuple(p for p in (p0, p1, p2) if p >= 0)
+            records.append({"iteration": it, "move": move, "params": params, "cost": cost,
+                            "violations": violations, "tau": tau, "omega": omega})
+    return number_teams, iteration, S, records
+
+# Rebuild the schedule of a logged run after its first moves accepted moves, or after every accepted
+#   move up to and including iteration, or at the end of the log. With a cost matrix the travel cost
+#   and violations of every replayed schedule are checked against the log. Returns the schedule and
+#   the last replayed record, None when no move was replayed.
+def replay(file_name, moves=None, iteration=None, cost_matrix=None):
+    number_teams, start, S, records = read_trajectory(file_name)
+    ttsa = make_solver(verbose=False,
+                       cost_matrix=cost_matrix if cost_matrix is not None else [[0] * number_teams for i in range(number_teams)])
+    ttsa.set_schedule(S)
+    apply = [getattr(ttsa, "apply_" + name) for name in MOVE_NAMES]
+
+    last = None
+    for k, record in enumerate(records):
+        if (moves is not None and k >= moves) or (iteration is not None and record["iteration"] > iteration):
+            break
+        apply[record["move"]](S, *record["params"])
+        if cost_matrix is not None:
+            cost, violations = ttsa.cost(S), ttsa.nbv(S)
+            if cost != record["cost"] or violations != record["violations"]:
+                raise ValueError("Replayed move %d at iteration %d gives cost %d with %d violations, the log has %d with %d" %
+                                 (k, record["iteration"], cost, violations, record["cost"], record["violations"]))
+        last = record
+    return S, last
+
+def main():
+    #Parse the command line arguments provided at run time.
+    parser = argparse.ArgumentParser(description='Replay a TTSA trajectory log')
+    parser.add_argument('log', metavar='LOG', help='Trajectory log written with --trajectory')
+    parser.add_argument('--moves', dest='moves', metavar='K', type=int,
+                        help='Rebuild the schedule after the first K accepted moves')
+    parser.add_argument('--iteration', dest='iteration', metavar='N', type=int,
+                        help='Rebuild the schedule as it was after iteration N')
+    parser.add_argument('-i', '--instance', dest='instance', metavar='PATH',
+                        help='Instance file, or directory of data{N}.txt files, to check every replayed cost against the log')
+    parser.add_argument('--list', dest='list', action='store_true', help='Print the logged moves instead of a schedule')
+    args = parser.parse_args()
+
+    if args.list:
+        number_teams, start, S, records = read_trajectory(args.log)
+        print("Iteration\tMove\tParams\tCost\tViolations\tTau\tOmega")
+        for record in records:
+            print(record["iteration"], MOVE_NAMES[record["move"]], record["params"], record["cost"], record["violations"],
+                  "%.4f" % record["tau"], "%.2f" % record["omega"], sep="\t")
+        return
+
+    cost_matrix = None
+    if args.instance:
+        from instances import load_cost_matrix
+        with open(args.log, 'rb') as f:
+            number_teams = read_header(f)[0]
+        cost_matrix = load_cost_matrix(args.instance, number_teams)
+
+    S, last = replay(args.log, args.moves, args.iteration, cost_matrix)
+    for row in S:
+        print(*row, sep="\t")
+    if last is not None:
+        print("\nIteration: %d\tMove: %s\tCost: %d\tViolations: %d\tTau: %.4f\tOmega: %.2f" %
+              (last["iteration"], MOVE_NAMES[last["move"]], last["cost"], last["violations"], last["tau"], last["omega"]))
+
+if __name__ == '__main__':
+    main()
@@ -15,22 +15,115 @@ __status__ = "in progress"
 import random
 import sys, copy
 import math
+import os
+import pickle
+import time
+from array import array
+from collections import OrderedDict
+
+# TTSA Includes
+from bounds import cached_lower_bound, relative_gap
+from instances import load_cost_matrix
+from selection import AdaptiveSelection
+from streams import RandomStream
+
+
+# Above this many touched slots in a row, delta_eval compares the whole row instead of the slots
+ROW_SLOTS = 8
+
+# The five neighborhoods, in the order random_move numbers them
+MOVE_NAMES = ["swap_homes", "swap_rounds", "swap_teams", "partial_swap_rounds", "partial_swap_teams"]
+
+# Default values of the SA parameters, the same as main.py
+DEFAULT_PARAMS = {"tau": 400, "beta": 0.9999, "omega": 4000, "delta": 1.04, "theta": 1.04,
+                  "maxc": 100, "maxp": 50, "maxr": 3, "gamma": 2}
+
+# The solver class for a schedule engine, the NumPy engine is optional so it is only imported when asked for
+def solver_class(engine="list"):
+    if engine == "numpy":
+        from ttsa_numpy import NumpyTTSA
+        return NumpyTTSA
+    if engine != "list":
+        raise ValueError("Unknown engine " + str(engine) + ", expected list or numpy")
+    return TTSA
+
+# A solver on the engine that has not run yet, with the given SA parameters and the rest at their
+#   defaults. The options are the keyword arguments of TTSA.
+def make_solver(params=None, engine="list", number_teams=None, seed=1, **options):
+    p = dict(DEFAULT_PARAMS)
+    p.update(params or {})
+    options.setdefault("run", False)
+    return solver_class(engine)(number_teams, seed, p["tau"], p["beta"], p["omega"], p["delta"], p["theta"],
+                                p["maxc"], p["maxp"], p["maxr"], p["gamma"], **options)
+
+# Compact encoding of a list schedule, one signed 16 bit int per game: +opponent at home, -opponent away
+def encode_schedule(S):
+    return array('h', [g[0] if g[1] == "home" else -g[0] for row in S for g in row]).tobytes()
+
+# Decode a compact schedule encoding back into rows of (opponent, "home"/"away") games
+def decode_schedule(data, number_teams):
+    values = array('h')
+    values.frombytes(data)
+    weeks = 2 * number_teams - 2
+    return [[(v, "home") if v > 0 else (-v, "away") for v in values[t * weeks:(t + 1) * weeks]]
+            for t in range(number_teams)]
+
+
+class TTSAResult():
+    """Best schedules and statistics of a TTSA solve"""
+
+    def __init__(self, best_feasible_S, best_feasible_cost, best_infeasible_S, best_infeasible_cost, iterations, seconds, finished,
+                 lower_bound=None, gap=None, move_weights=None):
+        # Best schedules as (opponent, "home"/"away") rows, empty and None costs when none was found
+        self.best_feasible_S = best_feasible_S
+        self.best_feasible_cost = best_feasible_cost
+        self.best_infeasible_S = best_infeasible_S
+        self.best_infeasible_cost = best_infeasible_cost
+
+        # Total iterations of the solver, seconds spent in this solve and whether the annealing ran to the end
+        self.iterations = iterations
+        self.seconds = seconds
+        self.finished = finished
+
+        # Lower bound on the travel cost and the relative gap of the best feasible cost above it,
+        #   None when the solver did not need the bound
+        self.lower_bound = lower_bound
+        self.gap = gap
+
+        # Current probabilities of the moves in the order of MOVE_NAMES
+        self.move_weights = move_weights
+
 
 class TTSA():
     """Traveling Tournament Simulated Annealing"""
 
-    def __init__(self, number_teams, seed, tau, beta, omega, delta, theta, maxc, maxp, maxr, gamma):
-        # Seed PRNG
-        if seed is 0:
-            random.seed()
-        else:
-            random.seed(seed)
+    def __init__(self, number_teams, seed, tau, beta, omega, delta, theta, maxc, maxp, maxr, gamma, in_place=True, instance=None, builder="circle",
+                 cost_matrix=None, verbose=True, target_cost=None, stop_event=None, run=True,
+                 checkpoint=None, checkpoint_every=None, checkpoint_seconds=None, resume=None, telemetry=None, cache_size=0, stream=None,
+                 target_gap=None, lower_bound=None, selection="uniform", selection_floor=0.05,
+                 candidates=1, candidate_mode="first", candidates_below=0.2, trajectory=None):
+        # Seed the solver's own PRNG, a seed of 0 is random. Solvers sharing a master seed run on the
+        #   independent substreams given by stream.
+        self.seed = seed
+        self.stream = stream
+        self.rng = RandomStream(seed if seed != 0 else None, stream)
+
+        # Read in the cost matrix unless an already loaded one is given,
+        #   the number of teams comes from it when not given
+        self.instance = instance
+        self.cost_matrix = []
+        self.cost_matrix = self.get_cost_matrix(number_teams, cost_matrix)
+        if number_teams is None:
+            number_teams = len(self.cost_matrix)
 
         # Calculate schedule vars
         self.number_teams = number_teams
         self.weeks = (2 * self.number_teams) - 2
         self.best_feasible_S = []
         self.best_infeasible_S = []
+        self.best_feasible_cost = sys.maxsize
+        self.best_infeasible_cost = sys.maxsize
+        self.iterations = 0
 
         # SA Parameters
         self.tau_not = tau
@@ -44,24 +137,151 @@ class TTSA():
         self.maxR = maxr
         self.gamma = gamma
 
+        # Apply and undo moves on the current schedule instead of deepcopying it every iteration
+        self.in_place = in_place
+
+        # Stop early once a feasible schedule this cheap is found, or one within target_gap of the lower
+        #   bound, or when another solver signals it. Unless given, the bound is only computed once a
+        #   target gap needs it or it is printed, it takes seconds on the larger instances.
+        self.target_cost = target_cost
+        self.target_gap = target_gap
+        self.lower_bound = lower_bound
+        self.exact_bound = lower_bound is not None
+        self.stop_event = stop_event
+
+        # Periodically save the annealing state to the checkpoint file, every so many iterations and/or seconds
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_seconds = checkpoint_seconds
+
+        # Optional Telemetry recording every move and every phase, nothing is measured without it
+        self.telemetry = telemetry
+
+        # Optional TrajectoryLog of every accepted move, with its parameters, to replay the run from
+        self.trajectory = trajectory
+
+        # The moves in the order of MOVE_NAMES, chosen uniformly or adaptively by their recent improvement
+        #   per second. Adaptive runs depend on timings, so they do not repeat exactly for a seed.
+        self.moves = [getattr(self, name) for name in MOVE_NAMES]
+        if selection not in ("uniform", "adaptive"):
+            raise ValueError("Unknown move selection " + selection + ", expected uniform or adaptive")
+        self.selector = AdaptiveSelection(self.rng, len(self.moves), selection_floor) if selection == "adaptive" else None
+
+        # Bounded LRU cache of the (cost, violations) of visited schedules keyed by their Zobrist hash,
+        #   no hashing is done when the size is 0
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.unchanged = 0
+        self.zobrist = self.zobrist_keys() if cache_size else None
+        self.hash = None
+        self.move_hash = None
+
+        # Once a phase accepts less than candidates_below of its proposals, the next ones are proposed in
+        #   batches of up to candidates moves, taking the first accepted one or the best of the batch
+        if candidate_mode not in ("first", "best"):
+            raise ValueError("Unknown candidate mode " + candidate_mode + ", expected first or best")
+        if candidates < 1:
+            raise ValueError("The number of candidates must be at least 1, not %d" % candidates)
+        self.candidates = candidates
+        self.candidate_mode = candidate_mode
+        self.candidates_below = candidates_below
+        self.batch_k = candidates
+
+        # Budgets and progress reporting of the current solve
+        self.max_iterations = None
+        self.deadline = None
+        self.callback = None
+        self.callback_every = None
+        self.finished = False
+
         # Set all the default vars for SA
+        if builder not in ("circle", "backtrack"):
+            raise ValueError("Unknown schedule builder " + str(builder) + ", expected circle or backtrack")
+        self.builder = builder
         self.S = self.build_schedule(self.number_teams)
 
-        # Read in the cost matrix
-        self.cost_matrix = []
-        self.cost_matrix = self.get_cost_matrix(self.number_teams)
+        # State of the annealing loop between solves, or from the checkpoint being resumed
+        self.loop_state = None
+        if resume is not None:
+            self.loop_state = self.load_checkpoint(resume)
 
-        # Perform the simulated annealing to solve the schedule
-        self.simulated_annealing()
+        # Perform the simulated annealing to solve the schedule, unless the caller drives the search itself
+        if not run:
+            return
+        self.solve()
 
         # Print out the stats / result
+        if verbose:
+            self.print_result()
+
+    # Run the annealing until it finishes or a budget is used up, and return a TTSAResult with the
+    #   best schedules found so far. Calling it again continues the same run with fresh budgets.
+    #   seconds and iterations bound this call, target_cost stops once a feasible schedule this cheap
+    #   is found, target_gap once one is within this fraction of the lower bound, and callback is called
+    #   with the current TTSAResult every callback_every iterations. With candidate batches the budgets
+    #   and callbacks wait for the batch to end, so a batch can run up to candidates iterations past them.
+    def solve(self, seconds=None, iterations=None, target_cost=None, callback=None, callback_every=1000, target_gap=None):
+        start_time = time.time()
+        self.deadline = start_time + seconds if seconds is not None else None
+        self.max_iterations = self.iterations + iterations if iterations is not None else None
+        if target_cost is not None:
+            self.target_cost = target_cost
+        if target_gap is not None:
+            self.target_gap = target_gap
+        # The bound for a target gap counts against the time budget
+        if self.target_gap is not None:
+            self.bound(self.deadline)
+        self.callback = callback
+        self.callback_every = callback_every
+
+        if not self.finished and not self.stop_requested():
+            self.simulated_annealing(self.loop_state)
+        if self.telemetry is not None:
+            self.telemetry.summary(iterations=self.iterations, finished=self.finished, cache=self.cache_stats(),
+                                   weights=self.move_weights())
+        if self.trajectory is not None:
+            self.trajectory.flush()
+        return self.result(time.time() - start_time)
+
+    # The best schedules and statistics so far
+    def result(self, seconds=0.0):
+        found_feasible = len(self.best_feasible_S) > 0
+        found_infeasible = len(self.best_infeasible_S) > 0
+        return TTSAResult(self.to_list(self.snapshot(self.best_feasible_S)) if found_feasible else [],
+                          self.best_feasible_cost if found_feasible else None,
+                          self.to_list(self.snapshot(self.best_infeasible_S)) if found_infeasible else [],
+                          self.best_infeasible_cost if found_infeasible else None,
+                          self.iterations, seconds, self.finished,
+                          self.lower_bound, self.gap() if found_feasible else None, self.move_weights())
+
+    # The lower bound on the travel cost, computed on first use. One cut short by the deadline is
+    #   looser and is completed on the next call.
+    def bound(self, deadline=None):
+        if not self.exact_bound:
+            self.lower_bound = cached_lower_bound(self.cost_matrix, deadline=deadline)
+            self.exact_bound = deadline is None or time.time() < deadline
+        return self.lower_bound
+
+    # Check whether the budgets of the current solve are used up
+    def budget_spent(self):
+        if self.max_iterations is not None and self.iterations >= self.max_iterations:
+            return True
+        return self.deadline is not None and time.time() >= self.deadline
+
+    # Prints the best feasible schedule, its cost and the parameters of the run
+    def print_result(self):
         print("\nThe best feasible schedule:")
         self.print_schedule(self.best_feasible_S)
         print("\nCost: " + str(self.cost_ttsa(self.best_feasible_S)))
-        print("Seed:", seed, "\tTau_0:", self.tau_not, "\tBeta:", self.beta, "\tOmega_0:", self.omega_not, "\tDelta:", self.delta, "\tTheta:", self.theta, "\tMaxC:", self.maxC, "\tMaxP:", self.maxP, "\tMaxR:", self.maxR, "\tGamma:", self.gamma, "\n")
+        if len(self.best_feasible_S) > 0:
+            print("Lower bound: %d\tGap: %.2f%%" % (self.bound(), 100 * self.gap()))
+        print("Seed:", self.seed, "\tTau_0:", self.tau_not, "\tBeta:", self.beta, "\tOmega_0:", self.omega_not, "\tDelta:", self.delta, "\tTheta:", self.theta, "\tMaxC:", self.maxC, "\tMaxP:", self.maxP, "\tMaxR:", self.maxR, "\tGamma:", self.gamma, "\n")
 
     # The Simulated Annelaing Algorithm TTSA from the TTP paper figure 2
-    def simulated_annealing(self):
+    #   When given the state of a checkpoint it continues exactly where that run left off.
+    def simulated_annealing(self, state=None):
         # Set default vars
         best_feasible = sys.maxsize
         nbf = sys.maxsize
@@ -70,45 +290,121 @@ class TTSA():
         best_tau = self.tau_not
         tau = self.tau_not
         reheat = 0
+        phase = 0
         counter = 0
-
-        # Loop until no more reheats
+        batching = False
+        phase_start = self.iterations
+        phase_accepted = 0
+        if state is not None:
+            best_feasible, nbf, best_infeasible, nbi = state["best_feasible"], state["nbf"], state["best_infeasible"], state["nbi"]
+            best_tau, tau, reheat, phase, counter = state["best_tau"], state["tau"], state["reheat"], state["phase"], state["counter"]
+            batching = state.get("batching", False)
+            phase_start = state.get("phase_start", self.iterations)
+            phase_accepted = state.get("phase_accepted", 0)
+            self.batch_k = state.get("batch_k", self.batch_k)
+
+        # Running cost and violations of the current schedule
+        self.set_schedule(self.S)
+        budgeted = self.max_iterations is not None or self.deadline is not None
+        telemetry = self.telemetry
+        selector = self.selector
+        timed = telemetry is not None or selector is not None
+        trajectory = self.trajectory
+        if trajectory is not None:
+            trajectory.start(self.number_teams, self.encode(self.S), self.iterations)
+        next_checkpoint = self.iterations + (self.checkpoint_every or 0)
+        checkpoint_time = time.time()
+        next_callback = -(-self.iterations // self.callback_every) * self.callback_every if self.callback is not None else None
+
+        # The loop variables, for checkpoints and for continuing in a later solve
+        def loop_state():
+            return {"best_feasible": best_feasible, "nbf": nbf, "best_infeasible": best_infeasible, "nbi": nbi,
+                    "best_tau": best_tau, "tau": tau, "reheat": reheat, "phase": phase, "counter": counter,
+                    "batching": batching, "phase_start": phase_start, "phase_accepted": phase_accepted, "batch_k": self.batch_k}
+
+        # Loop until no more reheats, the phase and counter loops reset their variable when they finish
+        #   so that a resumed run can pick up in the middle of them
         while reheat <= self.maxR:
-            phase = 0
             while phase <= self.maxP:
-                counter = 0
                 while counter <= self.maxC:
-                    # Make a deepcopy of the schedule
-                    S_prime = copy.deepcopy(self.S)
-                    S_prime = self.random_move(S_prime)
-                    cost_s = self.cost_ttsa(self.S)
-                    cost_s_p = self.cost_ttsa(S_prime)
-                    nbv_s_p = self.nbv(S_prime)
-                    if( (cost_s_p < cost_s) or
-                        (nbv_s_p == 0) and (cost_s_p < best_feasible) or
-                        (nbv_s_p > 0) and (cost_s_p < best_infeasible) ):
-                        accept = True
+                    # Save the state between two iterations when a checkpoint is due
+                    if self.checkpoint is not None and (
+                        (self.checkpoint_every and self.iterations >= next_checkpoint) or
+                        (self.checkpoint_seconds and time.time() - checkpoint_time >= self.checkpoint_seconds) ):
+                        self.save_checkpoint(self.checkpoint, loop_state())
+                        next_checkpoint = self.iterations + (self.checkpoint_every or 0)
+                        checkpoint_time = time.time()
+
+                    # Report progress and stop when the budget of the solve is used up
+                    if self.callback is not None and self.iterations >= next_callback:
+                        self.callback(self.result())
+                        next_callback = (self.iterations // self.callback_every + 1) * self.callback_every
+                    if budgeted and self.budget_spent():
+                        self.loop_state = loop_state()
+                        return
+
+                    # While most proposals are rejected, run through a batch of them in a tight loop and only
+                    #   bring the accepted one through the rest of the iteration. A batch is never cut short,
+                    #   so checkpoints, callbacks and budgets do not change the search.
+                    proposal = None
+                    if batching:
+                        proposal = self.propose_candidates(tau, best_feasible, best_infeasible)
+                        if proposal is None:
+                            continue
+
+                    self.iterations += 1
+                    if proposal is not None:
+                        S_prime = self.S
+                        choice, undo, d_cost, d_nbv = proposal
                     else:
-                        if math.exp(-abs(cost_s - cost_s_p) / tau) > random.random():
-                            accept = True
+                        # Apply the move in place, or to a deepcopy of the schedule
+                        if self.in_place:
+                            S_prime = self.S
                         else:
-                            accept = False
+                            S_prime = copy.deepcopy(self.S)
+                        choice = self.choose_move()
+                        if timed:
+                            move_start = time.perf_counter()
+                        undo = self.moves[choice](S_prime)
+                        # Only re-evaluate the legs and windows around the touched slots, unless the schedule is cached
+                        d_cost, d_nbv = self.evaluate(S_prime, undo)
+                    cost_s = self.penalty_cost(self.cur_cost, self.cur_nbv)
+                    cost_s_p = self.penalty_cost(self.cur_cost + d_cost, self.cur_nbv + d_nbv)
+                    nbv_s_p = self.cur_nbv + d_nbv
+                    accept = proposal is not None or self.accepts(cost_s, cost_s_p, nbv_s_p, tau, best_feasible, best_infeasible)
 
                     # Update best found feasible and infeasible schedules if necessary
                     if cost_s_p < best_feasible and nbv_s_p == 0:
-                        self.best_feasible_S = copy.deepcopy(S_prime)
+                        self.best_feasible_S = self.snapshot(S_prime)
                     if cost_s_p < best_infeasible and nbv_s_p > 0:
-                        self.best_infeasible_S = copy.deepcopy(S_prime)
-
-                    # Set new values if it is accepted
-                    if accept is True:
-                        self.S = copy.deepcopy(S_prime)
+                        self.best_infeasible_S = self.snapshot(S_prime)
+
+                    if timed and proposal is None:
+                        move_seconds = time.perf_counter() - move_start
+                        if telemetry is not None:
+                            telemetry.record_move(choice, move_seconds, accept, cost_s_p - cost_s)
+                        if selector is not None:
+                            selector.record(choice, move_seconds, cost_s - cost_s_p)
+
+                    # Set new values if it is accepted, otherwise roll the move back
+                    if accept is False:
+                        if self.in_place:
+                            self.undo_move(self.S, undo)
+                        else:
+                            self.restore_index(undo)
+                    else:
+                        self.S = S_prime
+                        self.cur_cost += d_cost
+                        self.cur_nbv += d_nbv
+                        self.hash = self.move_hash
+                        phase_accepted += 1
+                        if trajectory is not None:
+                            trajectory.record(self.iterations, choice, self.move_params, self.cur_cost, self.cur_nbv, tau, self.omega)
                         # Calculate new values for nbf or nbi
-                        if self.nbv(self.S) == 0:
-                            nbf = min(self.cost_ttsa(self.S), best_feasible)
+                        if self.cur_nbv == 0:
+                            nbf = min(cost_s_p, best_feasible)
                         else:
-                            nbi = min(self.cost_ttsa(self.S), best_infeasible)
-                            self.best_infeasible_S = copy.deepcopy(S_prime)
+                            nbi = min(cost_s_p, best_infeasible)
 
                         # Restart the process if a better feasible or infeasible solution is found
                         if (nbf < best_feasible) or (nbi < best_infeasible):
@@ -118,37 +414,318 @@ class TTSA():
                             best_tau = tau
                             best_feasible = nbf
                             best_infeasible = nbi
+                            self.best_feasible_cost = best_feasible
+                            self.best_infeasible_cost = best_infeasible
 
                             # Calculate new omega
-                            if self.nbv(self.S) == 0:
+                            if self.cur_nbv == 0:
                                 self.omega = self.omega / self.theta
                             else:
                                 self.omega = self.omega * self.delta
+
+                            if self.stop_requested():
+                                self.loop_state = loop_state()
+                                return
                         else:
                             counter += 1
                     # End counter Loop
+                counter = 0
                 phase += 1
                 tau = tau * self.beta
+                proposed = self.iterations - phase_start
+                batching = (self.candidates > 1 and self.in_place and proposed > 0 and
+                            phase_accepted < self.candidates_below * proposed)
+                phase_start = self.iterations
+                phase_accepted = 0
+                if telemetry is not None:
+                    telemetry.snapshot(iterations=self.iterations, reheat=reheat, phase=phase, tau=tau, omega=self.omega,
+                                       current_cost=self.cur_cost, current_nbv=self.cur_nbv,
+                                       current_ttsa_cost=self.penalty_cost(self.cur_cost, self.cur_nbv),
+                                       best_feasible=self.best_feasible_cost if best_feasible < sys.maxsize else None,
+                                       best_infeasible=self.best_infeasible_cost if best_infeasible < sys.maxsize else None,
+                                       gap=self.gap() if best_feasible < sys.maxsize else None, weights=self.move_weights())
+                if self.stop_requested():
+                    self.loop_state = loop_state()
+                    return
                 # End phase Loop
+            phase = 0
             reheat += 1
             tau = 2 * best_tau
             # End reheat Loop
+        self.finished = True
+
+    # The TTSA acceptance rule: a cheaper schedule or a new best one is always taken, anything else by
+    #   the Metropolis criterion at temperature tau
+    def accepts(self, cost_s, cost_s_p, nbv_s_p, tau, best_feasible, best_infeasible):
+        if( (cost_s_p < cost_s) or
+            (nbv_s_p == 0) and (cost_s_p < best_feasible) or
+            (nbv_s_p > 0) and (cost_s_p < best_infeasible) ):
+            return True
+        return math.exp(-abs(cost_s - cost_s_p) / tau) > self.rng.random()
+
+    # Propose a batch of moves on the current schedule in one tight loop, without the bookkeeping of
+    #   an annealing iteration. In the "first" mode up to candidates proposals are drawn and tested
+    #   exactly like one at a time, and the first accepted one is returned applied, as (choice, undo,
+    #   d_cost, d_nbv). In the "best" mode up to batch_k candidates are scored, and only the cheapest one
+    #   is tested and applied again when accepted, the batch size halving on an acceptance and doubling
+    #   on a rejection. A candidate giving a new best schedule is always taken at once, so a cheaper
+    #   candidate on the other side of feasibility cannot displace it. Every rejected proposal counts
+    #   as an iteration here, None is returned when all were rejected.
+    def propose_candidates(self, tau, best_feasible, best_infeasible):
+        S = self.S
+        best_mode = self.candidate_mode == "best"
+        telemetry = self.telemetry
+        selector = self.selector
+        timed = telemetry is not None or selector is not None
+        cost_s = self.penalty_cost(self.cur_cost, self.cur_nbv)
+        best = None
+        scored = []
+        for i in range(self.batch_k if best_mode else self.candidates):
+            choice = self.choose_move()
+            if timed:
+                move_start = time.perf_counter()
+            undo = self.moves[choice](S)
+            d_cost, d_nbv = self.evaluate(S, undo)
+            nbv_s_p = self.cur_nbv + d_nbv
+            cost_s_p = self.penalty_cost(self.cur_cost + d_cost, nbv_s_p)
+            if timed:
+                scored.append((choice, time.perf_counter() - move_start, cost_s_p - cost_s))
+            if best_mode:
+                accept = (nbv_s_p == 0 and cost_s_p < best_feasible) or (nbv_s_p > 0 and cost_s_p < best_infeasible)
+                if accept:
+                    self.batch_k = max(1, self.batch_k // 2)
+                elif best is None or cost_s_p < best[0]:
+                    best = (cost_s_p, nbv_s_p, choice, undo, self.redo_record(S, undo), d_cost, d_nbv, self.move_hash,
+                            self.move_params, len(scored) - 1)
+            else:
+                accept = self.accepts(cost_s, cost_s_p, nbv_s_p, tau, best_feasible, best_infeasible)
+            if accept:
+                self.record_candidates(scored, len(scored) - 1)
+                return choice, undo, d_cost, d_nbv
+            self.iterations += 1
+            self.undo_move(S, undo)
+
+        if best_mode:
+            cost_s_p, nbv_s_p, choice, undo, redo, d_cost, d_nbv, move_hash, move_params, k = best
+            if self.accepts(cost_s, cost_s_p, nbv_s_p, tau, best_feasible, best_infeasible):
+                self.iterations -= 1
+                self.redo_move(S, undo, redo)
+                self.move_hash = move_hash
+                self.move_params = move_params
+                self.record_candidates(scored, k)
+                self.batch_k = max(1, self.batch_k // 2)
+                return choice, undo, d_cost, d_nbv
+            self.batch_k = min(self.candidates, 2 * self.batch_k)
+        self.record_candidates(scored, None)
+        return None
 
-    def random_move(self, S):
-        # Select a random function to call on the schedule
-        choice = random.randint(0,4)
-
-        # Select and perform the operation
-        if choice is 0:
-            return self.swap_homes(S)
-        elif choice is 1:
-            return self.swap_rounds(S)
-        elif choice is 2:
-            return self.swap_teams(S)
-        elif choice is 3:
-            return self.partial_swap_rounds(S)
+    # Hand the timings of a batch of candidates to the telemetry and the move selector
+    def record_candidates(self, scored, accepted):
+        for k, (choice, seconds, delta) in enumerate(scored):
+            if self.telemetry is not None:
+                self.telemetry.record_move(choice, seconds, k == accepted, delta)
+            if self.selector is not None:
+                self.selector.record(choice, seconds, -delta)
+
+    # Atomically write the complete annealing state to a checkpoint file: the loop variables, the
+    #   schedules as compact encodings, omega, the iteration count and the PRNG state
+    def save_checkpoint(self, file_name, loop_state):
+        state = dict(loop_state)
+        state["number_teams"] = self.number_teams
+        state["S"] = self.encode(self.S)
+        state["best_feasible_S"] = self.encode(self.best_feasible_S) if len(self.best_feasible_S) > 0 else None
+        state["best_infeasible_S"] = self.encode(self.best_infeasible_S) if len(self.best_infeasible_S) > 0 else None
+        state["omega"] = self.omega
+        state["iterations"] = self.iterations
+        state["rng"] = self.rng
+        state["selector"] = self.selector
+
+        tmp_name = "%s.%d.tmp" % (file_name, os.getpid())
+        with open(tmp_name, 'wb') as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, file_name)
+        if self.trajectory is not None:
+            self.trajectory.flush()
+
+    # Restore the solver from a checkpoint file and return the loop variables for simulated_annealing
+    def load_checkpoint(self, file_name):
+        with open(file_name, 'rb') as f:
+            state = pickle.load(f)
+        if state["number_teams"] != self.number_teams:
+            raise ValueError("The checkpoint %s is for %d teams, not %d" % (file_name, state["number_teams"], self.number_teams))
+
+        self.S = self.decode(state["S"])
+        self.best_feasible_S = self.decode(state["best_feasible_S"]) if state["best_feasible_S"] else []
+        self.best_infeasible_S = self.decode(state["best_infeasible_S"]) if state["best_infeasible_S"] else []
+        self.best_feasible_cost = state["best_feasible"]
+        self.best_infeasible_cost = state["best_infeasible"]
+        self.omega = state["omega"]
+        self.iterations = state["iterations"]
+        self.rng = state["rng"]
+        self.selector = state.get("selector", self.selector)
+        if self.selector is not None:
+            self.selector.rng = self.rng
+        return state
+
+    # Replace the current schedule and recompute its running cost, violations, index and hash
+    def set_schedule(self, S):
+        self.S = S
+        self.cur_cost = self.cost(S)
+        self.cur_nbv = self.nbv(S)
+        self.index_schedule(S)
+        if self.cache_size:
+            self.hash = self.hash_schedule(S)
+
+    # The change in cost and violations of a move. A move that changed nothing is free, and with the
+    #   cache a schedule that was seen before is looked up by its hash instead of being evaluated.
+    #   The hash of the new schedule is kept in move_hash for when the move is accepted.
+    def evaluate(self, S, undo):
+        if not self.cache_size:
+            if self.is_empty(undo):
+                self.unchanged += 1
+                return 0, 0
+            return self.delta_eval(S, undo)
+
+        move_hash = self.move_hash = self.hash_move(S, undo)
+        if move_hash == self.hash:
+            self.unchanged += 1
+            return 0, 0
+        cached = self.cache.get(move_hash)
+        if cached is not None:
+            self.cache.move_to_end(move_hash)
+            self.cache_hits += 1
+            return cached[0] - self.cur_cost, cached[1] - self.cur_nbv
+
+        self.cache_misses += 1
+        d_cost, d_nbv = self.delta_eval(S, undo)
+        self.cache[move_hash] = (self.cur_cost + d_cost, self.cur_nbv + d_nbv)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return d_cost, d_nbv
+
+    # Whether a move left the schedule as it was
+    def is_empty(self, undo):
+        return not undo
+
+    # A random 64 bit key for every team, round and game, from a fixed seed so the global PRNG is untouched
+    def zobrist_keys(self):
+        prng = random.Random(self.number_teams)
+        keys = []
+        for t in range(self.number_teams):
+            games = [(j, ha) for j in range(1, self.number_teams + 1) if j != t + 1 for ha in ("home", "away")]
+            keys.append([{game: prng.getrandbits(64) for game in games} for r in range(self.weeks)])
+        return keys
+
+    # The Zobrist hash of a schedule, the xor of the keys of all of its games
+    def hash_schedule(self, S):
+        h = 0
+        for t, row in enumerate(S):
+            keys = self.zobrist[t]
+            for r, game in enumerate(row):
+                h ^= keys[r][game]
+        return h
+
+    # The hash of the schedule after a move, from the current hash and the touched slots only
+    def hash_move(self, S, undo):
+        h = self.hash
+        keys = self.zobrist
+        for (t, r), game in undo.items():
+            h ^= keys[t][r][game] ^ keys[t][r][S[t][r]]
+        return h
+
+    # Hits and misses of the evaluation cache
+    def cache_stats(self):
+        return {"size": self.cache_size, "entries": len(self.cache), "hits": self.cache_hits,
+                "misses": self.cache_misses, "unchanged": self.unchanged}
+
+    # Run a number of Metropolis steps at the constant temperature tau, as one replica of parallel
+    #   tempering. Omega adapts like in simulated_annealing whenever a new best schedule is found,
+    #   and once more at the end of the block depending on whether the chain is feasible.
+    #   Returns the TTSA cost, travel cost and violations of the current schedule.
+    def metropolis(self, steps, tau):
+        selector = self.selector
+        for i in range(steps):
+            self.iterations += 1
+            choice = self.choose_move()
+            if selector is not None:
+                move_start = time.perf_counter()
+            undo = self.moves[choice](self.S)
+            d_cost, d_nbv = self.evaluate(self.S, undo)
+            cost_s = self.penalty_cost(self.cur_cost, self.cur_nbv)
+            nbv_s_p = self.cur_nbv + d_nbv
+            cost_s_p = self.penalty_cost(self.cur_cost + d_cost, nbv_s_p)
+            if selector is not None:
+                selector.record(choice, time.perf_counter() - move_start, cost_s - cost_s_p)
+            if cost_s_p > cost_s and math.exp((cost_s - cost_s_p) / tau) <= self.rng.random():
+                self.undo_move(self.S, undo)
+                continue
+
+            self.cur_cost += d_cost
+            self.cur_nbv = nbv_s_p
+            self.hash = self.move_hash
+            if nbv_s_p == 0 and cost_s_p < self.best_feasible_cost:
+                self.best_feasible_S = self.snapshot(self.S)
+                self.best_feasible_cost = cost_s_p
+                self.omega = self.omega / self.theta
+            elif nbv_s_p > 0 and cost_s_p < self.best_infeasible_cost:
+                self.best_infeasible_S = self.snapshot(self.S)
+                self.best_infeasible_cost = cost_s_p
+                self.omega = self.omega * self.delta
+
+        # Push the replica towards feasibility while it is infeasible and relax once it is feasible
+        if self.cur_nbv > 0:
+            self.omega = self.omega * self.delta
         else:
-            return self.partial_swap_teams(S)
+            self.omega = self.omega / self.theta
+
+        return self.penalty_cost(self.cur_cost, self.cur_nbv), self.cur_cost, self.cur_nbv
+
+    # Compact encoding of a schedule for sending it to another process
+    def encode(self, S):
+        return encode_schedule(S)
+
+    # Decode a schedule sent by another process
+    def decode(self, data):
+        return decode_schedule(data, self.number_teams)
+
+    # Check whether the annealing should stop early, signalling the other solvers when the target is reached
+    def stop_requested(self):
+        if self.target_reached():
+            if self.stop_event is not None:
+                self.stop_event.set()
+            return True
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    # Whether the best feasible schedule reaches the target cost or is within the target gap of the lower bound
+    def target_reached(self):
+        if self.target_cost is not None and self.best_feasible_cost <= self.target_cost:
+            return True
+        return (self.target_gap is not None and self.lower_bound is not None and
+                self.best_feasible_cost < sys.maxsize and self.gap() <= self.target_gap)
+
+    # Relative gap of the best feasible cost above the lower bound, None while the bound is not known
+    def gap(self):
+        if self.lower_bound is None:
+            return None
+        return relative_gap(self.best_feasible_cost, self.lower_bound)
+
+    # Every move changes S in place and returns its undo record, a dict mapping each
+    #   (team, round) slot it changed to the game that was there before the move
+    def random_move(self, S):
+        # Select a random function to call on the schedule and perform the operation
+        return self.moves[self.choose_move()](S)
+
+    # Select the index of the next move in MOVE_NAMES
+    def choose_move(self):
+        if self.selector is not None:
+            return self.selector.choose()
+        return self.rng.below(len(self.moves))
+
+    # The current probabilities of the moves, None when they are chosen uniformly
+    def move_weights(self):
+        return list(self.selector.weights) if self.selector is not None else None
 
     # Determine the number of violations in a given schedule
     def nbv(self, S):
@@ -171,23 +748,24 @@ class TTSA():
         return violations
 
     # Builds the cost matrix for the coresponding number of teams
-    def get_cost_matrix(self, number_teams):
-        file_name = "data/data" + str(number_teams) + ".txt"
-        l = []
-        with open(file_name, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if len(line) > 0:
-                    l.append(line.split())
-
-        return l
+    #   The instance is a file or a directory of data{n}.txt files, the entries are already ints
+    def get_cost_matrix(self, number_teams, matrix=None):
+        if matrix is None:
+            matrix = load_cost_matrix(self.instance, number_teams)
+        if not isinstance(matrix, list):
+            matrix = matrix.tolist()
+        return matrix
 
     # Calculate the TTSA cost
     def cost_ttsa(self, S):
-        if self.nbv(S) == 0:
-            return self.cost(S)
+        return self.penalty_cost(self.cost(S), self.nbv(S))
+
+    # Calculate the TTSA cost from an already known travel cost and number of violations
+    def penalty_cost(self, cost, violations):
+        if violations == 0:
+            return cost
         else:
-            return math.sqrt(self.cost(S)**2 + (self.omega * self.fun(self.nbv(S))**2))
+            return math.sqrt(cost**2 + (self.omega * self.fun(violations)**2))
 
     # define fun (f function)
     def fun(self, v):
@@ -198,44 +776,201 @@ class TTSA():
         total_cost = 0
         cost_m = self.cost_matrix
         # Loop through the schedule calculating the cost along the way
-        for team in S:
-            i = S.index(team)
-            team.append((None, "home"))
+        for i, team in enumerate(S):
+            start_loc = i
             for game in team:
-                j = team.index(game)
-                start_loc = None
-                dest_loc = None
-                # Handle the first game case, get start location
-                if j is 0:
-                    start_loc = i
-                else:
-                    if team[j-1][1] is "home":
-                        start_loc = i
-                    else:
-                        start_loc = team[j-1][0] - 1
-
-                # Handle the last game case, get the travel location
-                if j is len(team) - 1:
+                # Travel from the previous location to this game
+                if game[1] == "home":
                     dest_loc = i
                 else:
-                    if team[j][1] is "home":
-                        dest_loc = i
-                    else:
-                        dest_loc = team[j][0] - 1
-                # Cost
-                total_cost += int(cost_m[start_loc][dest_loc])
-            # Pop off the placeholder location
-            team.pop()
+                    dest_loc = game[0] - 1
+                total_cost += cost_m[start_loc][dest_loc]
+                start_loc = dest_loc
+            # Return home after the last game
+            total_cost += cost_m[start_loc][i]
         return total_cost
 
+    # Calculate the change in cost and violations made by the move that produced S, where the
+    #   undo record holds the old games of the touched (team, round) slots. Every touched team is
+    #   compared with its old row on its own. A row with a few touched slots only has the travel legs
+    #   into and out of them, the no-repeat pairs they are in and, where the venue changed, the atmost
+    #   windows covering them re-evaluated. A row touched in more than ROW_SLOTS slots is compared as a
+    #   whole, which is cheaper than the bookkeeping of the single slots there.
+    def delta_eval(self, S, undo):
+        cost_m = self.cost_matrix
+        weeks = self.weeks
+        old_games = {}
+        for (t, r), game in undo.items():
+            old = old_games.get(t)
+            if old is None:
+                old = old_games[t] = {}
+            old[r] = game
+
+        d_cost = 0
+        d_nbv = 0
+        for t, old in old_games.items():
+            row = S[t]
+            old_row = row[:]
+            for r, game in old.items():
+                old_row[r] = game
+            if len(old) > ROW_SLOTS:
+                new_cost, new_nbv = self.span_eval(t, row, 0, weeks - 1)
+                old_cost, old_nbv = self.span_eval(t, old_row, 0, weeks - 1)
+                d_cost += new_cost - old_cost
+                d_nbv += new_nbv - old_nbv
+                continue
+
+            windows = None
+            for r, game in old.items():
+                new = row[r]
+                new_loc = t if new[1] == "home" else new[0] - 1
+                old_loc = t if game[1] == "home" else game[0] - 1
+                # The leg into round r and the pair of rounds r-1 and r
+                if r == 0:
+                    d_cost += cost_m[t][new_loc] - cost_m[t][old_loc]
+                else:
+                    prev = row[r - 1]
+                    prev_old = old_row[r - 1]
+                    d_cost += (cost_m[t if prev[1] == "home" else prev[0] - 1][new_loc] -
+                               cost_m[t if prev_old[1] == "home" else prev_old[0] - 1][old_loc])
+                    d_nbv += (prev[0] == new[0]) - (prev_old[0] == game[0])
+                # The leg out of round r and the pair of rounds r and r+1, unless round r+1 is touched
+                #   and counts them as its own
+                if r + 1 == weeks:
+                    d_cost += cost_m[new_loc][t] - cost_m[old_loc][t]
+                elif r + 1 not in old:
+                    nxt = row[r + 1]
+                    next_loc = t if nxt[1] == "home" else nxt[0] - 1
+                    d_cost += cost_m[new_loc][next_loc] - cost_m[old_loc][next_loc]
+                    d_nbv += (new[0] == nxt[0]) - (game[0] == nxt[0])
+                # Atmost window w covers rounds w to w+3
+                if new[1] != game[1]:
+                    if windows is None:
+                        windows = set()
+                    windows.update(range(max(0, r - 3), min(r, weeks - 4) + 1))
+
+            if windows:
+                for w in windows:
+                    venue = row[w][1]
+                    if row[w + 1][1] == venue and row[w + 2][1] == venue and row[w + 3][1] == venue:
+                        d_nbv += 1
+                    venue = old_row[w][1]
+                    if old_row[w + 1][1] == venue and old_row[w + 2][1] == venue and old_row[w + 3][1] == venue:
+                        d_nbv -= 1
+        return d_cost, d_nbv
+
+    # Sum the travel legs and count the violations of team t's row of games within rounds a to b: the
+    #   legs between them, from home when a is the first round and back home when b is the last, the
+    #   repeated opponents and the atmost windows of 4 games at the same venue
+    def span_eval(self, t, row, a, b):
+        cost_m = self.cost_matrix
+        last_opp, last_venue = row[a]
+        start_loc = t if last_venue == "home" else last_opp - 1
+        total_cost = cost_m[t][start_loc] if a == 0 else 0
+        violations = 0
+        run = 1
+        for opp, venue in row[a + 1:b + 1]:
+            dest_loc = t if venue == "home" else opp - 1
+            total_cost += cost_m[start_loc][dest_loc]
+            start_loc = dest_loc
+            if opp == last_opp:
+                violations += 1
+            if venue == last_venue:
+                run += 1
+                if run > 3:
+                    violations += 1
+            else:
+                run = 1
+            last_opp = opp
+            last_venue = venue
+        if b == self.weeks - 1:
+            total_cost += cost_m[start_loc][t]
+        return total_cost, violations
+
+    # Write a game into the schedule, remembering the old game of the slot in the undo record
+    def set_game(self, S, t, r, game, undo=None):
+        if undo is not None and (t, r) not in undo:
+            undo[(t, r)] = S[t][r]
+        S[t][r] = game
+
+    # Roll back a move using its undo record
+    def undo_move(self, S, undo):
+        for (t, r), game in undo.items():
+            S[t][r] = game
+        self.restore_index(undo)
+
+    # The new games of the slots a move touched, to apply it again after it was rolled back
+    def redo_record(self, S, undo):
+        return [S[t][r] for t, r in undo]
+
+    # Apply a rolled back move again from its undo and redo records
+    def redo_move(self, S, undo, redo):
+        for (t, r), game in zip(undo, redo):
+            S[t][r] = game
+        self.update_index(S, undo)
+
+    # Build the index from every team and game, (opponent, "home"/"away"), to the round it is played in.
+    #   Together with the schedule itself, which maps (team, round) to the game, it lets the moves find
+    #   any game in constant time.
+    def index_schedule(self, S):
+        self.where = [{game: r for r, game in enumerate(row)} for row in S]
+
+    # Bring the index up to date after a move. A move keeps every team playing each game exactly once,
+    #   so only the games now in the touched slots have moved.
+    def update_index(self, S, undo):
+        where = self.where
+        for t, r in undo:
+            where[t][S[t][r]] = r
+        return undo
+
+    # Point the index back at the old games of the touched slots after a move is rejected
+    def restore_index(self, undo):
+        where = self.where
+        for (t, r), game in undo.items():
+            where[t][game] = r
+
+    # Cheap copy of a schedule, the games themselves are immutable tuples
+    def snapshot(self, S):
+        return [row[:] for row in S]
+
     # Builds a random starting schedule to build and improve on
     def build_schedule(self, number_teams):
+        if self.builder == "circle":
+            return self.circle_schedule(number_teams)
+
         # Create an empty schedule
         S = [[None for i in range(self.weeks)] for j in range(number_teams)]
 
         # Call the recursive build function
         return self.r_build_schedule(S, 0, 0)
 
+    # Builds a random double round robin directly with the circle method: team n-1 stays fixed
+    #   while the others rotate around it. The teams are randomly relabeled, the rounds randomly
+    #   ordered and every pair of games randomly gets its home and away legs flipped.
+    def circle_schedule(self, number_teams):
+        S = [[None for i in range(self.weeks)] for j in range(number_teams)]
+        labels = self.rng.permutation(number_teams)
+        order = self.rng.permutation(self.weeks)
+
+        half = number_teams - 1
+        for r in range(half):
+            # The fixed team plays the team at the top of the circle, the rest pair off across it
+            pairs = [(number_teams - 1, r)]
+            for k in range(1, number_teams // 2):
+                pairs.append(((r + k) % half, (r - k) % half))
+
+            for a, b in pairs:
+                home, away = labels[a], labels[b]
+                if self.rng.random() < 0.5:
+                    home, away = away, home
+                # First leg in round order[r], the return leg in round order[r + half]
+                S[home][order[r]] = (away + 1, "home")
+                S[away][order[r]] = (home + 1, "away")
+                S[away][order[r + half]] = (home + 1, "home")
+                S[home][order[r + half]] = (away + 1, "away")
+
+        return S
+
     # Recursive part of build schedule
     def r_build_schedule(self, S, team, week):
         # If the schedule is full then return becuase it is complete
@@ -255,7 +990,7 @@ class TTSA():
 
         # Find all of the possible games that can be scheduled, return if it isn't schedulable
         possibilities = self.get_game(S, team, week)
-        random.shuffle(possibilities)
+        self.rng.shuffle(possibilities)
         if possibilities is None:
             return None
 
@@ -282,12 +1017,12 @@ class TTSA():
         return True
 
     # Given the schedule and a specfic match, schedule the opponent for that match
-    def set_opponent(self, S, i, j):
+    def set_opponent(self, S, i, j, undo=None):
         match = S[i][j]
         if match[1] is "home":
-            S[match[0]-1][j] = (i+1, "away")
+            self.set_game(S, match[0]-1, j, (i+1, "away"), undo)
         else:
-            S[match[0]-1][j] = (i+1, "home")
+            self.set_game(S, match[0]-1, j, (i+1, "home"), undo)
 
         return S
 
@@ -313,21 +1048,28 @@ class TTSA():
     # The move swaps the home and away roles of team T in pos i and j
     # Because this is going to be a random choice everytime the function is called,
     #   the choice is just made inside of the function instead of being passed in.
+    #   Every move keeps its choices in move_params and applies them with its apply_ method.
     def swap_homes(self, S):
         # Choose a team to swap on
         team  = len(S) - 1
-        swap_loc = S[team].index(random.choice(S[team]))
-        swap_loc_mirror = S[team].index(self.home_away(S[team][swap_loc]))
+        swap_loc = self.where[team][self.rng.choice(S[team])]
+        self.move_params = (team, swap_loc)
+        return self.apply_swap_homes(S, team, swap_loc)
+
+    # Swap the home and away roles of the game of team in round swap_loc and of its return game
+    def apply_swap_homes(self, S, team, swap_loc):
+        swap_loc_mirror = self.where[team][self.home_away(S[team][swap_loc])]
 
         # Swap the first game and its opponent
-        S[team][swap_loc] = self.home_away(S[team][swap_loc])
-        S = self.set_opponent(S, team, swap_loc)
+        undo = {}
+        self.set_game(S, team, swap_loc, self.home_away(S[team][swap_loc]), undo)
+        self.set_opponent(S, team, swap_loc, undo)
 
         # Swap the matching game and its opponent
-        S[team][swap_loc_mirror] = self.home_away(S[team][swap_loc_mirror])
-        S = self.set_opponent(S, team, swap_loc_mirror)
+        self.set_game(S, team, swap_loc_mirror, self.home_away(S[team][swap_loc_mirror]), undo)
+        self.set_opponent(S, team, swap_loc_mirror, undo)
 
-        return S
+        return self.update_index(S, undo)
 
     # Given a game, swap the home/awayness of that game
     def home_away(self, game):
@@ -341,81 +1083,94 @@ class TTSA():
     #   the choice is just made inside of the function instead of being passed in.
     def swap_rounds(self, S):
         # Choose two different rounds to swap
-        choices = random.sample(list(range(len(S[0]))), 2)
+        k, l = self.rng.pair(len(S[0]))
+        self.move_params = (k, l)
+        return self.apply_swap_rounds(S, k, l)
 
+    # Swap rounds k and l of every team
+    def apply_swap_rounds(self, S, k, l):
         # Iterate through the teams swapping each rounds
+        undo = {}
         for team in range(len(S)):
-            game_one = S[team][choices[0]]
-            game_two = S[team][choices[1]]
-            S[team][choices[0]] = game_two
-            S[team][choices[1]] = game_one
+            self.swap_game_round(S, team, k, l, undo)
 
-        return S
+        return self.update_index(S, undo)
 
     # This move swaps the schedule for teams i and j except of course, when they play against each other
     # Because this is going to be a random choice everytime the function is called,
     #   the choice is just made inside of the function instead of being passed in.
     def swap_teams(self, S):
         # Choose two different teams to swap
-        choices = random.sample(list(range(len(S))), 2)
+        i, j = self.rng.pair(len(S))
+        self.move_params = (i, j)
+        return self.apply_swap_teams(S, i, j)
+
+    # Swap the schedules of teams i and j
+    def apply_swap_teams(self, S, i, j):
+        choices = (i, j)
 
         # Swap the teams completely
-        team_one = S[choices[0]]
-        team_two = S[choices[1]]
-        S[choices[0]] = team_two
-        S[choices[1]] = team_one
+        undo = {}
+        for game in range(len(S[choices[0]])):
+            team_one = S[choices[0]][game]
+            team_two = S[choices[1]][game]
+            self.set_game(S, choices[0], game, team_two, undo)
+            self.set_game(S, choices[1], game, team_one, undo)
 
         # Resolve the same team conflicts
         for game in range(len(S[choices[0]])):
             # If the team is playing itself fix it and resolve opponent
-            if S[choices[0]][game][0] - 1 is choices[0]:
-                S[choices[0]][game] = self.home_away(S[choices[1]][game])
-                S = self.set_opponent(S, choices[0], game)
+            if S[choices[0]][game][0] - 1 == choices[0]:
+                self.set_game(S, choices[0], game, self.home_away(S[choices[1]][game]), undo)
+                self.set_opponent(S, choices[0], game, undo)
 
         # Resolve the opponents
         for team in choices:
             for game in range(len(S[team])):
-                S = self.set_opponent(S, team, game)
+                self.set_opponent(S, team, game, undo)
 
-        return S
+        return self.update_index(S, undo)
 
     # This mode considers team T and swaps its games at round k and l
     # Because this is going to be a random choice everytime the function is called,
     #   the choice is just made inside of the function instead of being passed in.
     def partial_swap_rounds(self, S):
         # Choose a random team and two random rounds to swap
-        s_team = random.sample(list(range(len(S))), 1)[0]
-        s_rounds = random.sample(list(range(len(S[0]))), 2)
+        s_team = self.rng.below(len(S))
+        k, l = self.rng.pair(len(S[0]))
+        self.move_params = (s_team, k, l)
+        return self.apply_partial_swap_rounds(S, s_team, k, l)
 
-        # Create a starting list
-        p_swap = [s_team]
-
-        # Chain ejection until everything is in the list
-        while 1:
-            # loop through the list adding new teams if necessary
-            for item in p_swap:
-                if S[item][s_rounds[0]][0]-1 not in p_swap:
-                    p_swap.append(S[item][s_rounds[0]][0]-1)
+    # Swap rounds k and l of s_team and of every team pulled into the swap by the chain ejection
+    def apply_partial_swap_rounds(self, S, s_team, k, l):
+        s_rounds = (k, l)
 
-                if S[item][s_rounds[1]][0]-1 not in p_swap:
-                    p_swap.append(S[item][s_rounds[1]][0]-1)
+        # Create a starting list, with a set for the membership checks
+        p_swap = [s_team]
+        in_swap = {s_team}
 
-            # Check to see if the list is fully inclusive
-            if (S[p_swap[-1]][s_rounds[0]][0]-1 in p_swap) and (S[p_swap[-1]][s_rounds[1]][0]-1 in p_swap) and (S[p_swap[-2]][s_rounds[0]][0]-1 in p_swap) and (S[p_swap[-2]][s_rounds[1]][0]-1 in p_swap):
-                break
+        # Chain ejection until every opponent in either round is in the list, the loop also
+        #   visits the teams appended while it runs
+        for item in p_swap:
+            for r in s_rounds:
+                opponent = S[item][r][0] - 1
+                if opponent not in in_swap:
+                    in_swap.add(opponent)
+                    p_swap.append(opponent)
 
         # Loop through the list for one of the rounds and swap all the games in the list
+        undo = {}
         for item in p_swap:
-            S = self.swap_game_round(S, item, s_rounds[0], s_rounds[1])
+            self.swap_game_round(S, item, s_rounds[0], s_rounds[1], undo)
 
-        return S
+        return self.update_index(S, undo)
 
     # Swap games by same team different rounds
-    def swap_game_round(self, S, t, rl, rk):
+    def swap_game_round(self, S, t, rl, rk, undo=None):
         game_one = S[t][rl]
         game_two = S[t][rk]
-        S[t][rl] = game_two
-        S[t][rk] = game_one
+        self.set_game(S, t, rl, game_two, undo)
+        self.set_game(S, t, rk, game_one, undo)
         return S
 
     # This move considers round rk and swaps the games of teams Ti and Tj
@@ -423,56 +1178,54 @@ class TTSA():
     #   the choice is just made inside of the function instead of being passed in.
     def partial_swap_teams(self, S):
         # Choose a random round and two random teams to swap
-        s_round = random.sample(list(range(len(S[0]))), 1)[0]
-        s_teams = random.sample(list(range(len(S))), 2)
+        s_round = self.rng.below(len(S[0]))
+        t1, t2 = self.rng.pair(len(S))
+        self.move_params = (s_round, t1, t2)
+        return self.apply_partial_swap_teams(S, s_round, t1, t2)
+
+    # Swap the games of teams t1 and t2 in round s_round and in every round pulled in by the chain ejection
+    def apply_partial_swap_teams(self, S, s_round, t1, t2):
+        s_teams = (t1, t2)
 
         # Handle case where the games cannot be swapped because it is invalid (cant play yourself)
         if not (set(s_teams) - set([S[s_teams[0]][s_round][0]-1, S[s_teams[1]][s_round][0]-1])):
-            return S
+            return {}
 
-        # Create a starting list
-        p_swap = [S[s_teams[0]][s_round], S[s_teams[1]][s_round]]
+        # Create a starting list of rounds, with a set for the membership checks
+        p_indices = [s_round]
+        in_swap = {s_round}
+        where_one = self.where[s_teams[0]]
+        where_two = self.where[s_teams[1]]
 
-        # Chain ejection until everything is in the list
-        while 1:
-            # Loop through the list adding new teams if necessary
-            for item in p_swap:
-                if self.get_concurrent(S, s_teams[0], s_teams[1], item) not in p_swap:
-                    p_swap.append(self.get_concurrent(S, s_teams[0], s_teams[1], item))
-
-                if self.get_concurrent(S, s_teams[1], s_teams[0], item) not in p_swap:
-                    p_swap.append(self.get_concurrent(S, s_teams[1], s_teams[0], item))
-
-            if( (self.get_concurrent(S, s_teams[0], s_teams[1], p_swap[-1]) in p_swap) and (self.get_concurrent(S, s_teams[1], s_teams[0], p_swap[-1]) in p_swap) and
-                (self.get_concurrent(S, s_teams[0], s_teams[1], p_swap[-2]) in p_swap) and (self.get_concurrent(S, s_teams[1], s_teams[0], p_swap[-2]) in p_swap) ):
-                break
-
-        # Get the indices of the games found
-        p_indices = []
-        for item in p_swap:
-            p_indices.append(S[s_teams[0]].index(item))
+        # Chain ejection: a game moving into the other team's row has to leave the round where that
+        #   team already plays it, so that round joins the list too. The index finds those rounds.
+        for idx in p_indices:
+            for game in (S[s_teams[0]][idx], S[s_teams[1]][idx]):
+                for other in (where_one.get(game), where_two.get(game)):
+                    if other is not None and other not in in_swap:
+                        in_swap.add(other)
+                        p_indices.append(other)
 
         # Loop through the list for one of the teams and swap all of the games and resolve opponents
+        undo = {}
         for idx in p_indices:
-            S = self.swap_game_team(S, idx, s_teams[0], s_teams[1])
+            self.swap_game_team(S, idx, s_teams[0], s_teams[1], undo)
 
-        return S
+        return self.update_index(S, undo)
 
     # Swap games by same round different teams and resolve opponents
-    def swap_game_team(self, S, r, T1, T2):
+    def swap_game_team(self, S, r, T1, T2, undo=None):
         game_one = S[T1][r]
         game_two = S[T2][r]
-        S[T1][r] = game_two
-        S[T2][r] = game_one
-        S = self.set_opponent(S, T1, r)
-        S = self.set_opponent(S, T2, r)
+        self.set_game(S, T1, r, game_two, undo)
+        self.set_game(S, T2, r, game_one, undo)
+        self.set_opponent(S, T1, r, undo)
+        self.set_opponent(S, T2, r, undo)
         return S
 
-    # Given a two teams and a game, find the concurrent game for the other teams
-    def get_concurrent(self, S, T1, T2, game):
-        for i, j in enumerate(S[T1]):
-            if j == game:
-                return S[T2][i]
+    # The schedule as a list of (opponent, "home"/"away") rows, which it already is
+    def to_list(self, S):
+        return S
 
     # Prints the schedule in a way that is readable
     def print_schedule(self, S):
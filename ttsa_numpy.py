@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+
+"""ttsa_numpy.py: NumPy array engine for the Traveling Tournament Simulated Annealing"""
+
+__author__ = "Colin Burgin"
+__copyright__ = "Copyright 2017, Virginia Tech"
+__credits__ = [""]
+__license__ = "MIT"
+__version__ = "1.0"
+__maintainer__ = "Colin Burgin"
+__email__ = "cburgin@vt.edu"
+__status__ = "in progress"
+
+# Third Party Libraries
+import numpy as np
+
+# TTSA Includes
+from instances import load_cost_matrix
+from ttsa import TTSA
+
+# Above this many touched slots, delta_eval evaluates the whole schedule with array operations
+ARRAY_SLOTS = 8
+
+
+# Convert a list of (opponent, "home"/"away") rows into an n x (2n-2) array,
+#   +opponent for a home game and -opponent for an away game
+def to_array(S):
+    return np.array([[g[0] if g[1] == "home" else -g[0] for g in row] for row in S], dtype=np.int64)
+
+# Convert an array schedule back into the list of (opponent, "home"/"away") rows
+def to_schedule(A):
+    return [[(int(v), "home") if v > 0 else (int(-v), "away") for v in row] for row in A]
+
+# Travel cost of every leg of the given rows, leg l goes from round l-1 to round l
+#   and the first and last legs start and end at the team's own venue
+def leg_costs(block, teams, cost_m):
+    home = teams[:, None]
+    loc = np.where(block > 0, home, np.abs(block) - 1)
+    loc = np.concatenate((home, loc, home), axis=1)
+    return cost_m[loc[:, :-1], loc[:, 1:]]
+
+# Marks every pair of consecutive rounds where a row plays the same opponent twice
+def repeats(block):
+    opp = np.abs(block)
+    return opp[:, 1:] == opp[:, :-1]
+
+# Marks every window of four rounds where a row is at home or away all four times, by the number of
+#   home games in every window from the running count of them
+def runs(block):
+    home = np.zeros((len(block), block.shape[1] + 1), dtype=np.int64)
+    np.cumsum(block > 0, axis=1, out=home[:, 1:])
+    home = home[:, 4:] - home[:, :-4]
+    return (home == 0) | (home == 4)
+
+
+class NumpyTTSA(TTSA):
+    """Traveling Tournament Simulated Annealing on a signed integer array schedule"""
+
+    # The cost matrix as plain lists, for delta_eval to read single entries from
+    cost_rows = None
+
+    # Builds the random starting schedule with the list builder and converts it
+    def build_schedule(self, number_teams):
+        return to_array(TTSA.build_schedule(self, number_teams))
+
+    # Builds the cost matrix as an integer array, memory-mapped from its cache when there is one
+    def get_cost_matrix(self, number_teams, matrix=None):
+        if matrix is None:
+            matrix = load_cost_matrix(self.instance, number_teams)
+        return np.asarray(matrix, dtype=np.int64)
+
+    # Calculate the cost of the input schedule
+    def cost(self, A):
+        A = self.as_array(A)
+        return int(leg_costs(A, np.arange(len(A)), self.cost_matrix).sum())
+
+    # Determine the number of violations in a given schedule
+    def nbv(self, A):
+        A = self.as_array(A)
+        return np.count_nonzero(repeats(A)) + np.count_nonzero(runs(A))
+
+    # The best schedules start out as an empty list before anything is found
+    def as_array(self, A):
+        return np.asarray(A, dtype=np.int64).reshape(len(A), self.weeks)
+
+    # Calculate the change in cost and violations made by the move that produced A. The undo
+    #   record holds the rows, rounds and old values of the touched slots. For a few slots, array
+    #   operations cost more than they save, so the touched rows are read out as plain ints and only
+    #   the legs, pairs and windows around the touched slots are compared. A move touching more slots
+    #   is evaluated on the whole schedule against the running cost and violations of the one before.
+    def delta_eval(self, A, undo):
+        rows, cols, old = undo
+        if len(rows) == 0:
+            return 0, 0
+        if len(rows) > ARRAY_SLOTS:
+            return self.cost(A) - self.cur_cost, self.nbv(A) - self.cur_nbv
+        if self.cost_rows is None:
+            self.cost_rows = self.cost_matrix.tolist()
+        cost_m = self.cost_rows
+        weeks = self.weeks
+        old_games = {}
+        for t, r, v in zip(rows.tolist(), cols.tolist(), old.tolist()):
+            slots = old_games.get(t)
+            if slots is None:
+                slots = old_games[t] = {}
+            slots[r] = v
+
+        d_cost = 0
+        d_nbv = 0
+        for t, old in old_games.items():
+            row = A[t].tolist()
+            old_row = row[:]
+            for r, v in old.items():
+                old_row[r] = v
+
+            windows = None
+            for r, v in old.items():
+                new = row[r]
+                new_loc = t if new > 0 else -new - 1
+                old_loc = t if v > 0 else -v - 1
+                # The leg into round r and the pair of rounds r-1 and r
+                if r == 0:
+                    d_cost += cost_m[t][new_loc] - cost_m[t][old_loc]
+                else:
+                    prev = row[r - 1]
+                    prev_old = old_row[r - 1]
+                    d_cost += (cost_m[t if prev > 0 else -prev - 1][new_loc] -
+                               cost_m[t if prev_old > 0 else -prev_old - 1][old_loc])
+                    d_nbv += (prev == new or prev == -new) - (prev_old == v or prev_old == -v)
+                # The leg out of round r and the pair of rounds r and r+1, unless round r+1 is touched
+                #   and counts them as its own
+                if r + 1 == weeks:
+                    d_cost += cost_m[new_loc][t] - cost_m[old_loc][t]
+                elif r + 1 not in old:
+                    nxt = row[r + 1]
+                    next_loc = t if nxt > 0 else -nxt - 1
+                    d_cost += cost_m[new_loc][next_loc] - cost_m[old_loc][next_loc]
+                    d_nbv += (nxt == new or nxt == -new) - (nxt == v or nxt == -v)
+                # Atmost window w covers rounds w to w+3
+                if (new > 0) != (v > 0):
+                    if windows is None:
+                        windows = set()
+                    windows.update(range(max(0, r - 3), min(r, weeks - 4) + 1))
+
+            if windows:
+                for w in windows:
+                    venue = row[w] > 0
+                    if (row[w + 1] > 0) == venue and (row[w + 2] > 0) == venue and (row[w + 3] > 0) == venue:
+                        d_nbv += 1
+                    venue = old_row[w] > 0
+                    if (old_row[w + 1] > 0) == venue and (old_row[w + 2] > 0) == venue and (old_row[w + 3] > 0) == venue:
+                        d_nbv -= 1
+        return d_cost, d_nbv
+
+    # Roll back a move using its undo record
+    def undo_move(self, A, undo):
+        rows, cols, old = undo
+        A[rows, cols] = old
+        self.restore_index(undo)
+
+    # The new values of the slots a move touched, to apply it again after it was rolled back
+    def redo_record(self, A, undo):
+        rows, cols, old = undo
+        return A[rows, cols]
+
+    # Apply a rolled back move again from its undo and redo records
+    def redo_move(self, A, undo, redo):
+        rows, cols, old = undo
+        A[rows, cols] = redo
+        self.update_index(A, undo)
+
+    # Build the index from every team and signed game to the round it is played in, where[t, v + n]
+    def index_schedule(self, A):
+        n = len(A)
+        self.where = np.zeros((n, 2 * n + 1), dtype=np.int64)
+        self.where[np.arange(n)[:, None], A + n] = np.arange(self.weeks)
+
+    # Bring the index up to date after a move, only the games now in the touched slots have moved
+    def update_index(self, A, undo):
+        rows, cols, old = undo
+        self.where[rows, A[rows, cols] + len(A)] = cols
+        return undo
+
+    # Point the index back at the old games of the touched slots after a move is rejected
+    def restore_index(self, undo):
+        rows, cols, old = undo
+        self.where[rows, old + self.number_teams] = cols
+
+    # Whether a move left the schedule as it was
+    def is_empty(self, undo):
+        return len(undo[0]) == 0
+
+    # A random 64 bit key for every team, round and signed game, zobrist[t, r, v + n]
+    def zobrist_keys(self):
+        n = self.number_teams
+        prng = np.random.default_rng(n)
+        return prng.integers(0, 2 ** 64, size=(n, self.weeks, 2 * n + 1), dtype=np.uint64, endpoint=False)
+
+    # The Zobrist hash of a schedule, the xor of the keys of all of its games
+    def hash_schedule(self, A):
+        n, weeks = A.shape
+        keys = self.zobrist[np.arange(n)[:, None], np.arange(weeks), A + n]
+        return int(np.bitwise_xor.reduce(keys, axis=None))
+
+    # The hash of the schedule after a move, the undo record can list a slot twice so it is counted once
+    def hash_move(self, A, undo):
+        rows, cols, old = undo
+        flat, first = np.unique(rows * self.weeks + cols, return_index=True)
+        rows, cols, old = rows[first], cols[first], old[first]
+        n = len(A)
+        keys = self.zobrist[rows, cols, old + n] ^ self.zobrist[rows, cols, A[rows, cols] + n]
+        return self.hash ^ int(np.bitwise_xor.reduce(keys))
+
+    # Copy of a schedule
+    def snapshot(self, A):
+        return A.copy()
+
+    # The schedule as a list of (opponent, "home"/"away") rows
+    def to_list(self, A):
+        return to_schedule(A)
+
+    # Compact encoding of a schedule for sending it to another process
+    def encode(self, A):
+        return A.astype(np.int16).tobytes()
+
+    # Decode a schedule sent by another process
+    def decode(self, data):
+        return np.frombuffer(data, dtype=np.int16).astype(np.int64).reshape(self.number_teams, self.weeks)
+
+    # Prints the schedule in a way that is readable
+    def print_schedule(self, A):
+        TTSA.print_schedule(self, to_schedule(A))
+
+    # Save the old values of the slots a move is about to write, this is the undo record
+    def record(self, A, rows, cols):
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        return rows, cols, A[rows, cols]
+
+    # The move swaps the home and away roles of team T in pos i and j
+    def swap_homes(self, A):
+        # Choose a team to swap on, the same draw as choosing one of its games
+        team = len(A) - 1
+        swap_loc = self.rng.below(self.weeks)
+        self.move_params = (team, swap_loc)
+        return self.apply_swap_homes(A, team, swap_loc)
+
+    # Swap the home and away roles of the game of team in round swap_loc and of its return game
+    def apply_swap_homes(self, A, team, swap_loc):
+        swap_loc_mirror = int(self.where[team, len(A) - A[team, swap_loc]])
+
+        # Swap both games of the pair and their opponents
+        opponent = abs(int(A[team, swap_loc])) - 1
+        locs = [swap_loc, swap_loc_mirror]
+        undo = self.record(A, [team, team, opponent, opponent], locs + locs)
+        A[team, locs] = -A[team, locs]
+        A[opponent, locs] = -A[opponent, locs]
+        return self.update_index(A, undo)
+
+    # The move simply swaps rounds k and l
+    def swap_rounds(self, A):
+        # Choose two different rounds to swap
+        k, l = self.rng.pair(self.weeks)
+        self.move_params = (k, l)
+        return self.apply_swap_rounds(A, k, l)
+
+    # Swap rounds k and l of every team
+    def apply_swap_rounds(self, A, k, l):
+        teams = np.arange(len(A))
+        undo = self.record(A, np.concatenate((teams, teams)), np.repeat([k, l], len(A)))
+        A[:, [k, l]] = A[:, [l, k]]
+        return self.update_index(A, undo)
+
+    # This move swaps the schedule for teams i and j except of course, when they play against each other
+    def swap_teams(self, A):
+        # Choose two different teams to swap
+        i, j = self.rng.pair(len(A))
+        self.move_params = (i, j)
+        return self.apply_swap_teams(A, i, j)
+
+    # Swap the schedules of teams i and j
+    def apply_swap_teams(self, A, i, j):
+        # Every slot of both teams and of their opponents in that round changes
+        rounds = np.arange(self.weeks)
+        opp_i = np.abs(A[i]) - 1
+        opp_j = np.abs(A[j]) - 1
+        undo = self.record(A, np.concatenate((np.full(self.weeks, i), np.full(self.weeks, j), opp_i, opp_j)),
+                           np.tile(rounds, 4))
+
+        # Swap the rows, flipping the venue when they play against each other
+        mutual = opp_i == j
+        row_i = np.where(mutual, -A[i], A[j])
+        row_j = np.where(mutual, -A[j], A[i])
+        A[i] = row_i
+        A[j] = row_j
+
+        # Resolve the opponents
+        A[np.abs(row_i) - 1, rounds] = -np.sign(row_i) * (i + 1)
+        A[np.abs(row_j) - 1, rounds] = -np.sign(row_j) * (j + 1)
+        return self.update_index(A, undo)
+
+    # This mode considers team T and swaps its games at round k and l
+    def partial_swap_rounds(self, A):
+        # Choose a random team and two random rounds to swap
+        s_team = self.rng.below(len(A))
+        k, l = self.rng.pair(self.weeks)
+        self.move_params = (s_team, k, l)
+        return self.apply_partial_swap_rounds(A, s_team, k, l)
+
+    # Swap rounds k and l of s_team and of every team pulled into the swap by the chain ejection
+    def apply_partial_swap_rounds(self, A, s_team, k, l):
+        # Chain ejection until every opponent in either round is in the set
+        p_swap = [s_team]
+        seen = {s_team}
+        for item in p_swap:
+            for r in (k, l):
+                opponent = abs(int(A[item, r])) - 1
+                if opponent not in seen:
+                    seen.add(opponent)
+                    p_swap.append(opponent)
+
+        # Swap both rounds for every team in the chain
+        undo = self.record(A, p_swap + p_swap, [k] * len(p_swap) + [l] * len(p_swap))
+        A[p_swap, k], A[p_swap, l] = A[p_swap, l], A[p_swap, k]
+        return self.update_index(A, undo)
+
+    # This move considers round rk and swaps the games of teams Ti and Tj
+    def partial_swap_teams(self, A):
+        # Choose a random round and two random teams to swap
+        s_round = self.rng.below(self.weeks)
+        t1, t2 = self.rng.pair(len(A))
+        self.move_params = (s_round, t1, t2)
+        return self.apply_partial_swap_teams(A, s_round, t1, t2)
+
+    # Swap the games of teams t1 and t2 in round s_round and in every round pulled in by the chain ejection
+    def apply_partial_swap_teams(self, A, s_round, t1, t2):
+        # Handle case where the games cannot be swapped because it is invalid (cant play yourself)
+        if abs(int(A[t1, s_round])) - 1 == t2:
+            return self.record(A, [], [])
+
+        # Chain ejection: a game that moves into a team's round must leave its old round, which
+        #   the index finds. Team t1 never plays itself, so a game against t1 is skipped for it.
+        n = len(A)
+        row_1 = A[t1].tolist()
+        row_2 = A[t2].tolist()
+        where_1 = self.where[t1].tolist()
+        where_2 = self.where[t2].tolist()
+        rounds = [s_round]
+        seen = {s_round}
+        for r in rounds:
+            for game in (row_1[r], row_2[r]):
+                for team, where in ((t1, where_1), (t2, where_2)):
+                    if abs(game) == team + 1:
+                        continue
+                    other = where[game + n]
+                    if other not in seen:
+                        seen.add(other)
+                        rounds.append(other)
+
+        # Swap the games of both teams in those rounds and resolve the opponents
+        rounds = np.array(rounds)
+        game_1 = A[t1, rounds]
+        game_2 = A[t2, rounds]
+        undo = self.record(A, np.concatenate((np.full(len(rounds), t1), np.full(len(rounds), t2),
+                                              np.abs(game_1) - 1, np.abs(game_2) - 1)),
+                           np.tile(rounds, 4))
+        A[t1, rounds] = game_2
+        A[t2, rounds] = game_1
+        A[np.abs(game_2) - 1, rounds] = -np.sign(game_2) * (t1 + 1)
+        A[np.abs(game_1) - 1, rounds] = -np.sign(game_1) * (t2 + 1)
+        return self.update_index(A, undo)